@@ -151,7 +151,7 @@ class DecodeurTrameZigbee:
 
         offset += 1
 
-        destination_endpoint = int.from_bytes(octets_trame[offset:offset+1])
+        destination_endpoint = octets_trame[offset] if offset < len(octets_trame) else 0
 
         offset += 1
 
@@ -164,11 +164,11 @@ class DecodeurTrameZigbee:
 
         offset += 2
 
-        source_endpoint = int.from_bytes(octets_trame[offset:offset+1])
+        source_endpoint = octets_trame[offset] if offset < len(octets_trame) else 0
 
         offset += 1
 
-        counter = int.from_bytes(octets_trame[offset:offset+1])
+        counter = octets_trame[offset] if offset < len(octets_trame) else 0
 
         offset += 1
 
@@ -215,7 +215,7 @@ class DecodeurTrameZigbee:
 
         offset += 1
 
-        Sequence_number = int.from_bytes(octets_trame[offset:offset+1])
+        Sequence_number = octets_trame[offset] if offset < len(octets_trame) else 0
 
         offset += 1
 
@@ -483,9 +483,9 @@ class DecodeurTrameZigbee:
             - key_sequence_number : Numéro de séquence de la clé
             - offset : Décalage après l'en-tête de sécurité
         """
-        print(octets_trame[offset:offset+1].hex())
-
         Security_control_field = octets_trame[offset:offset+1]
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Champ de contrôle de sécurité : %s", Security_control_field.hex())
 
         val = bin(int.from_bytes(Security_control_field, byteorder='little'))[2:].zfill(8)
         val = val[::-1]
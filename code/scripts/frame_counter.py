@@ -72,3 +72,61 @@ class ZigbeeFrameFinder:
             return trame_hex[:-4] + new_sequence_number + '00'
         else:
             return trame_hex[:-4] + new_sequence_number + '02'
+
+    def increment_frame_counter_bytes(self, trame: bytearray, increment: int = 10) -> bytearray:
+        """
+        Incrémente le frame counter d'une trame Zigbee directement sur ses octets.
+
+        Équivalent de `increment_frame_counter` pour une trame déjà convertie en bytearray :
+        l'octet du frame counter (4e octet depuis la fin) est modifié sur place, sans passer
+        par la représentation hexadécimale. Les positions étant comptées depuis la fin de la
+        trame, un éventuel préfixe (comme l'octet '61' envoyé au firmware) n'a pas d'incidence.
+
+        Args:
+            trame (bytearray): La trame Zigbee, modifiée sur place.
+            increment (int): La valeur à ajouter au frame counter (par défaut 10).
+
+        Returns:
+            bytearray: La même trame, avec le frame counter incrémenté.
+
+        Raises:
+            ValueError: Si le nouveau frame counter ne tient plus sur un octet.
+        """
+        trame[-4] += increment
+        return trame
+
+    def increment_counters_bytes(self, trame: bytearray, increment_fc: int = 1, increment_seq: int = 1) -> bytearray:
+        """
+        Incrémente en une seule passe le frame counter et le numéro de séquence d'une trame.
+
+        Équivalent sur octets de `increment_frame_counter` suivi de `increment_sequence_number`,
+        pour la boucle de rejeu qui met à jour les deux champs à chaque envoi : la trame est
+        modifiée sur place avec de simples accès indexés. Le dernier octet suit l'alternance
+        de `increment_sequence_number`, basée sur son quartet de poids faible :
+            - 0 (off) devient 0x01 (on).
+            - 1 (on) devient 0x00 (off).
+            - Sinon, 0x02 (toggle).
+
+        Args:
+            trame (bytearray): La trame Zigbee, modifiée sur place.
+            increment_fc (int): La valeur à ajouter au frame counter (par défaut 1).
+            increment_seq (int): La valeur à ajouter au numéro de séquence (par défaut 1).
+
+        Returns:
+            bytearray: La même trame, avec les deux champs incrémentés.
+
+        Raises:
+            ValueError: Si l'un des champs ne tient plus sur un octet.
+        """
+        trame[-4] += increment_fc
+        trame[-2] += increment_seq
+
+        # Alternance basée sur la valeur du dernier octet
+        quartet = trame[-1] & 0x0F
+        if quartet == 0:
+            trame[-1] = 0x01
+        elif quartet == 1:
+            trame[-1] = 0x00
+        else:
+            trame[-1] = 0x02
+        return trame
@@ -2,6 +2,11 @@ import random
 import struct
 from typing import List
 
+# Disposition du payload On/Off (big-endian, sans alignement) :
+# MAC (FC, seq, PAN, dst, src), NWK (FC, dst, src, radius, seq),
+# APS (FC, endpoint dst, cluster, profil, endpoint src, compteur), ZCL (FC, seq, commande)
+FORMAT_PAYLOAD = struct.Struct('>HBHHH' 'HHHBB' 'BBHHBB' 'BBB')
+
 class ZigBeeHAZCLOnOffPayloadGenerator:
     """
     Générateur de payloads ZigBee Home Automation On/Off 
@@ -31,50 +36,55 @@ class ZigBeeHAZCLOnOffPayloadGenerator:
             }
         }
 
+        # Liste aplatie des commandes possibles, construite une seule fois
+        self.command_bytes = []
+        for cmd in self.config['commands'].values():
+            if isinstance(cmd, list):
+                self.command_bytes.extend(cmd)
+            else:
+                self.command_bytes.append(cmd)
+
+        self.mutation_strategies = [
+            self._bit_flip,
+            self._random_byte_replace,
+            self._extreme_value_injection
+        ]
+
     def generate_zigbee_payload(self) -> bytes:
         """
         Génère un payload ZigBee On/Off complet
         """
-        # Structure de base du payload basée sur la trace Wireshark
-        payload = bytearray()
-        
-        # IEEE 802.15.4 Frame
-        payload.extend(struct.pack('>H', random.choice(self.config['ieee_frame_control'])))  # Frame Control
-        payload.extend(struct.pack('B', random.randint(0, 255)))  # Sequence Number
-        payload.extend(struct.pack('>H', random.randint(0, 0xFFFF)))  # Destination PAN
-        payload.extend(struct.pack('>H', random.randint(0, 0xFFFF)))  # Destination Address
-        payload.extend(struct.pack('>H', random.randint(0, 0xFFFF)))  # Source Address
-        
-        # Network Layer
-        payload.extend(struct.pack('>H', random.choice(self.config['nwk_frame_control'])))  # Frame Control
-        payload.extend(struct.pack('>H', random.randint(0, 0xFFFF)))  # Destination
-        payload.extend(struct.pack('>H', random.randint(0, 0xFFFF)))  # Source
-        payload.extend(struct.pack('B', random.randint(1, 30)))  # Radius
-        payload.extend(struct.pack('B', random.randint(0, 255)))  # Sequence Number
-        
-        # APS Layer
-        payload.extend(struct.pack('B', random.choice(self.config['aps_frame_control'])))  # Frame Control
-        payload.extend(struct.pack('B', random.choice(self.config['endpoints']['destination'])))  # Destination Endpoint
-        payload.extend(struct.pack('>H', self.config['clusters']['On/Off']))  # Cluster
-        payload.extend(struct.pack('>H', 0x0104))  # Profile (Home Automation)
-        payload.extend(struct.pack('B', random.choice(self.config['endpoints']['source'])))  # Source Endpoint
-        payload.extend(struct.pack('B', random.randint(0, 255)))  # Counter
-        
-        # ZCL Frame
-        payload.extend(struct.pack('B', random.choice(self.config['zcl_frame_control'])))  # Frame Control
-        payload.extend(struct.pack('B', random.randint(0, 255)))  # Sequence Number
-        
-        # Correction ici :
-        command_bytes = []
-        for cmd in self.config['commands'].values():
-            if isinstance(cmd, list):
-                command_bytes.extend(cmd)
-            else:
-                command_bytes.append(cmd)
-        payload.extend(struct.pack('B', random.choice(command_bytes)))  # Command
-    
+        # Structure de base du payload basée sur la trace Wireshark,
+        # encodée en un seul appel avec le format précompilé
+        config = self.config
+        return FORMAT_PAYLOAD.pack(
+            # IEEE 802.15.4 Frame
+            random.choice(config['ieee_frame_control']),  # Frame Control
+            random.randint(0, 255),  # Sequence Number
+            random.randint(0, 0xFFFF),  # Destination PAN
+            random.randint(0, 0xFFFF),  # Destination Address
+            random.randint(0, 0xFFFF),  # Source Address
+
+            # Network Layer
+            random.choice(config['nwk_frame_control']),  # Frame Control
+            random.randint(0, 0xFFFF),  # Destination
+            random.randint(0, 0xFFFF),  # Source
+            random.randint(1, 30),  # Radius
+            random.randint(0, 255),  # Sequence Number
 
-        return bytes(payload)
+            # APS Layer
+            random.choice(config['aps_frame_control']),  # Frame Control
+            random.choice(config['endpoints']['destination']),  # Destination Endpoint
+            config['clusters']['On/Off'],  # Cluster
+            0x0104,  # Profile (Home Automation)
+            random.choice(config['endpoints']['source']),  # Source Endpoint
+            random.randint(0, 255),  # Counter
+
+            # ZCL Frame
+            random.choice(config['zcl_frame_control']),  # Frame Control
+            random.randint(0, 255),  # Sequence Number
+            random.choice(self.command_bytes)  # Command
+        )
 
     def generate_anomaly_payloads(self, num_payloads=50) -> List[bytes]:
         """
@@ -86,13 +96,7 @@ class ZigBeeHAZCLOnOffPayloadGenerator:
         """
         Applique des mutations sur le payload
         """
-        mutation_strategies = [
-            self._bit_flip,
-            self._random_byte_replace,
-            self._extreme_value_injection
-        ]
-        
-        strategy = random.choice(mutation_strategies)
+        strategy = random.choice(self.mutation_strategies)
         return strategy(payload)
 
     def _bit_flip(self, payload: bytes) -> bytes:
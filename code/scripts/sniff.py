@@ -13,18 +13,38 @@ import serial
 import logging
 import threading
 import queue
+import collections
 import time
 import json
+import pickle
 import glob
-from datetime import datetime
+import hmac
+import functools
+import re
+import selectors
+from binascii import unhexlify
 from Cryptodome.Cipher import AES
-import math
 import os
+import struct
 from DecodeurTrame import DecodeurTrameZigbee
-# Import pour gestion PCAP
-import scapy.all as scapy
-from scapy.layers.dot15d4 import Dot15d4, Dot15d4FCS
-from scapy.config import conf
+# Sérialisation JSON : orjson (en C) si disponible, sinon json compact de la bibliothèque standard
+try:
+    import orjson
+
+    def _json_dumps(objet):
+        return orjson.dumps(objet)
+except ImportError:
+    orjson = None
+
+    def _json_dumps(objet):
+        return json.dumps(objet, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+# CCM en C (OpenSSL, AES-NI) via le paquet cryptography s'il est installé ; sinon CCM* est
+# déroulé en Python sur le contexte AES-ECB de Cryptodome (voir _dechiffrer_trame)
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESCCM
+    from cryptography.exceptions import InvalidTag
+except ImportError:
+    AESCCM = None
 #from Cryptodome.Util.Padding import pad,Counter
 
 # Configuration de la journalisation
@@ -38,9 +58,82 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Configuration spécifique pour Scapy - définir le protocole Zigbee
-conf.dot15d4_protocol = "zigbee"
+# Nombre maximal d'octets lus par appel os.read sur le descripteur série
+TAILLE_LECTURE = 8192
+# Taille (en octets) demandée pour le tampon de réception du pilote série (Windows)
+TAILLE_TAMPON_RECEPTION = 262144
+# Attente maximale (en secondes) du port série avant de revérifier la condition d'arrêt
+DELAI_SELECTION = 0.1
+# Délai maximal (en secondes) accordé au périphérique pour confirmer un changement de canal
+DELAI_REPONSE_CANAL = 0.5
+# Nombre maximal de trames décodées retenues avant un déchiffrement groupé
+TAILLE_LOT_DECHIFFREMENT = 16
+# Nombre de trames écrites dans le fichier PCAP entre deux vidages du tampon d'écriture
+TAILLE_LOT_PCAP = 64
+# En-têtes PCAP, dans l'ordre des octets natif : en-tête global (magic, version 2.4, fuseau,
+# précision, longueur de capture maximale, linktype) puis en-tête de chaque enregistrement
+# (secondes, microsecondes, longueur capturée, longueur réelle)
+LINKTYPE_IEEE802_15_4 = 195
+ENTETE_GLOBAL_PCAP = struct.Struct('=IHHiIII')
+ENTETE_ENREGISTREMENT_PCAP = struct.Struct('=IIII')
+# Nombre maximal de lots en attente dans la file des paquets avant d'ignorer les suivants
+TAILLE_MAX_FILE_PAQUETS = 1000
+# Taille maximale (en octets) d'une ligne série incomplète conservée entre deux lectures
+TAILLE_MAX_LIGNE = 4096
+
+# Attente maximale (en secondes) de la fin d'un thread de capture ou de traitement
+DELAI_ARRET_THREADS = 1.0
+# Marqueur déposé dans la file des paquets pour terminer le thread de traitement
+FIN_TRAITEMENT = object()
+
+# Commandes de changement de mode du firmware ESP32H2, déjà encodées
+COMMANDE_MODE_SNIFF = b"#CMD#MODE_SNIFF"
+COMMANDE_MODE_TX = b"#CMD#MODE_TX"
+
+# Formats des lignes produites par les adaptateurs, compilés une fois pour toutes (sur octets)
+MOTIF_NRF52 = re.compile(rb"received: ([0-9a-fA-F]+) power: (-?\d+) lqi: (\d+) time: (\d+)")
+MOTIF_ESP32H2 = re.compile(rb"\[\s*(\d+)\|RSSI:\s*(-?\d+)dB\|\s*(\d+)B\]\s*([0-9a-fA-F]+)")
+# Début des lignes de trame du nRF52840
+PREFIXE_NRF52 = b"received:"
+# Caractères admis dans la trame hexadécimale d'une ligne série
+CHIFFRES_HEXA = b"0123456789abcdefABCDEF"
+
+
+def _extraire_champs_nrf52(paquet):
+    """
+    Extrait la trame et les métadonnées d'une ligne série nRF52840.
+
+    La ligne attendue, "received: <hex> power: <int> lqi: <int> time: <int>", est découpée
+    par `bytes.split` et les champs sont lus à position fixe ; l'expression régulière
+    MOTIF_NRF52 ne sert que pour les lignes qui s'écartent de ce format (préfixe, espaces
+    ou jetons inattendus).
 
+    Paramètres
+    ----------
+    paquet : bytes
+        Ligne série brute.
+
+    Retours
+    -------
+    tuple or None
+        (trame_hex, power, lqi, timestamp) : la trame en hexadécimal, laissée en octets
+        pour `unhexlify`, et les trois métadonnées déjà converties en entiers, ou None si
+        la ligne n'est pas reconnue.
+    """
+    jetons = paquet.split()
+    if (len(jetons) >= 8 and jetons[0] == PREFIXE_NRF52 and jetons[2] == b"power:"
+            and jetons[4] == b"lqi:" and jetons[6] == b"time:"
+            and not jetons[1].strip(CHIFFRES_HEXA)
+            and jetons[3].lstrip(b"-").isdigit() and jetons[5].isdigit() and jetons[7].isdigit()):
+        return jetons[1], int(jetons[3]), int(jetons[5]), int(jetons[7])
+    match = MOTIF_NRF52.search(paquet)
+    if match:
+        trame_hex, power, lqi, timestamp = match.groups()
+        return trame_hex, int(power), int(lqi), int(timestamp)
+    return None
+
+
+@functools.lru_cache(maxsize=1)
 def trouver_peripheriques_serie():
     """
     Recherche les périphériques série USB compatibles.
@@ -49,12 +142,502 @@ def trouver_peripheriques_serie():
     le nom correspond au motif '/dev/tty*', ce qui est généralement le cas sur
     les systèmes Unix/Linux pour les interfaces série.
 
+    Retours
+    -------
+    tuple
+        Chemins d'accès aux périphériques série trouvés.
+
+    Notes
+    -----
+    Le résultat est mis en cache : le répertoire /dev n'est parcouru qu'une fois, même si
+    plusieurs sniffers sont construits. Après le branchement d'un nouvel adaptateur, appeler
+    `trouver_peripheriques_serie.cache_clear()` pour forcer une nouvelle recherche.
+    """
+    return tuple(glob.glob('/dev/tty*'))
+
+
+# Contextes AES-ECB déjà construits, indexés par clé hexadécimale : l'expansion de clé
+# (faite en C par Cryptodome, avec AES-NI si disponible) n'a lieu qu'une fois par clé
+_contextes_aes = {}
+# Contextes AESCCM (paquet cryptography), indexés de la même façon
+_contextes_ccm = {}
+
+# Table du CRC-16 ITU-T (variante Kermit, polynôme réfléchi 0x8408) utilisé comme FCS
+# IEEE 802.15.4 : un accès à la table par octet au lieu de deux étapes de 4 bits
+_TABLE_FCS = []
+for _octet in range(256):
+    _crc = _octet
+    for _ in range(8):
+        _crc = (_crc >> 1) ^ 0x8408 if _crc & 1 else _crc >> 1
+    _TABLE_FCS.append(_crc)
+del _octet, _crc
+
+# Niveau de sécurité réellement appliqué par ZigBee PRO (ENC-MIC-32) : il n'est pas
+# transmis sur l'air et doit être réinjecté dans le nonce et les données authentifiées
+NIVEAU_SECURITE_ZIGBEE = 5
+LONGUEUR_MIC = 4
+
+
+def calculer_fcs(donnees):
+    """
+    Calcule le FCS IEEE 802.15.4 (CRC-16 Kermit) d'une trame.
+
+    Même résultat que `Dot15d4FCS.compute_fcs` de Scapy, sans passer par un paquet Scapy.
+
+    Paramètres
+    ----------
+    donnees : bytes
+        Octets de la trame, FCS exclu.
+
+    Retours
+    -------
+    bytes
+        Les deux octets du FCS, en little-endian.
+    """
+    crc = 0
+    for octet in donnees:
+        crc = (crc >> 8) ^ _TABLE_FCS[(crc ^ octet) & 0xFF]
+    return struct.pack('<H', crc)
+
+
+def _epingler_thread(coeur):
+    """
+    Restreint le thread appelant au cœur CPU `coeur`, lorsque c'est possible.
+
+    L'affinité est fixée depuis le thread lui-même (pid 0 : le thread courant sous Linux),
+    ce qui évite d'avoir à récupérer son identifiant noyau. L'opération est facultative :
+    si la plateforme ne propose pas `os.sched_setaffinity` (Windows, macOS) ou si le cœur
+    ne fait pas partie des cœurs autorisés au processus, le thread reste libre.
+
+    Paramètres
+    ----------
+    coeur : int or None
+        Numéro du cœur CPU. None laisse le thread sur tous les cœurs.
+    """
+    if coeur is None or not hasattr(os, 'sched_setaffinity'):
+        return
+    try:
+        if coeur not in os.sched_getaffinity(0):
+            logger.warning("Cœur CPU %s indisponible, thread non épinglé", coeur)
+            return
+        os.sched_setaffinity(0, {coeur})
+    except OSError as e:
+        logger.warning("Impossible d'épingler le thread sur le cœur %s : %s", coeur, e)
+
+
+def _elever_priorite_thread(priorite):
+    """
+    Passe le thread appelant en ordonnancement temps réel SCHED_FIFO, lorsque c'est possible.
+
+    Un thread SCHED_FIFO préempte les tâches ordinaires dès que ses données sont prêtes :
+    la lecture série n'est plus retardée par la charge du système, et le tampon du pilote
+    ne déborde pas. L'opération demande la capacité CAP_SYS_NICE, par exemple :
+    ``sudo setcap cap_sys_nice+ep $(readlink -f $(which python3))``. Sans elle, ou sur
+    une plateforme sans `os.sched_setscheduler`, le thread garde sa priorité normale.
+
+    Paramètres
+    ----------
+    priorite : int or None
+        Priorité SCHED_FIFO (1 à 99). None laisse l'ordonnancement inchangé.
+    """
+    if priorite is None or not hasattr(os, 'sched_setscheduler'):
+        return
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priorite))
+    except PermissionError:
+        logger.warning("Priorité temps réel refusée (capacité CAP_SYS_NICE requise), priorité normale conservée")
+    except OSError as e:
+        logger.warning("Impossible de passer le thread en SCHED_FIFO (priorité %s) : %s", priorite, e)
+
+
+def _drapeau_cpuinfo(drapeau):
+    """
+    Indique si `drapeau` figure parmi les drapeaux du processeur listés dans /proc/cpuinfo.
+
+    Retours
+    -------
+    bool or None
+        None si /proc/cpuinfo est absent ou ne liste aucun drapeau.
+    """
+    try:
+        with open('/proc/cpuinfo', encoding='utf-8') as f:
+            for ligne in f:
+                if ligne.startswith('flags'):
+                    return drapeau in ligne.split()
+    except OSError:
+        pass
+    return None
+
+
+@functools.lru_cache(maxsize=1)
+def aes_ni_disponible():
+    """
+    Indique si le processeur dispose des instructions AES-NI.
+
+    La détection s'appuie sur Cryptodome (instruction CPUID), puis à défaut sur les drapeaux
+    de /proc/cpuinfo. Le résultat est mis en cache.
+
+    Retours
+    -------
+    bool or None
+        True ou False selon la présence d'AES-NI, None si la détection est impossible.
+    """
+    try:
+        from Cryptodome.Util._cpu_features import have_aes_ni
+        return bool(have_aes_ni())
+    except (ImportError, AttributeError, OSError):
+        pass
+    return _drapeau_cpuinfo('aes')
+
+
+@functools.lru_cache(maxsize=1)
+def pclmulqdq_disponible():
+    """
+    Indique si le processeur dispose de l'instruction PCLMULQDQ (multiplication sans retenue).
+
+    Elle accélère le calcul d'étiquette GHASH des modes GCM ; le MIC de CCM repose sur
+    CBC-MAC, c'est-à-dire sur AES seul. Même détection que `aes_ni_disponible`.
+
+    Retours
+    -------
+    bool or None
+        True ou False selon la présence de PCLMULQDQ, None si la détection est impossible.
+    """
+    try:
+        from Cryptodome.Util._cpu_features import have_clmul
+        return bool(have_clmul())
+    except (ImportError, AttributeError, OSError):
+        pass
+    return _drapeau_cpuinfo('pclmulqdq')
+
+
+def contexte_aes(cle_hex):
+    """
+    Retourne le contexte AES-ECB associé à une clé, en le créant au premier appel.
+
+    Paramètres
+    ----------
+    cle_hex : str
+        Clé AES-128 au format hexadécimal.
+
+    Retours
+    -------
+    object
+        Contexte AES-ECB de Cryptodome, partagé par tous les appels avec la même clé.
+    """
+    contexte = _contextes_aes.get(cle_hex)
+    if contexte is None:
+        contexte = _contextes_aes[cle_hex] = AES.new(bytes.fromhex(cle_hex), AES.MODE_ECB)
+    return contexte
+
+
+def contexte_ccm(cle_hex):
+    """
+    Retourne le contexte AESCCM (MIC de 4 octets) associé à une clé, ou None si le paquet
+    cryptography n'est pas installé.
+
+    Paramètres
+    ----------
+    cle_hex : str
+        Clé AES-128 au format hexadécimal.
+
+    Retours
+    -------
+    object or None
+        Contexte AESCCM de cryptography, partagé par tous les appels avec la même clé.
+    """
+    if AESCCM is None:
+        return None
+    contexte = _contextes_ccm.get(cle_hex)
+    if contexte is None:
+        contexte = _contextes_ccm[cle_hex] = AESCCM(bytes.fromhex(cle_hex), tag_length=LONGUEUR_MIC)
+    return contexte
+
+
+def _longueur_entete_mac(octets_trame):
+    """
+    Calcule la longueur de l'en-tête MAC IEEE 802.15.4 d'après son champ de contrôle.
+    """
+    controle = int.from_bytes(octets_trame[:2], 'little')
+    mode_adresse_dst = (controle >> 10) & 0x03
+    mode_adresse_src = (controle >> 14) & 0x03
+    compression_pan_id = (controle >> 6) & 0x01
+
+    longueur = 3  # Champ de contrôle + numéro de séquence
+    if mode_adresse_dst:
+        longueur += 2 + (2 if mode_adresse_dst == 2 else 8)
+    if mode_adresse_src:
+        if not compression_pan_id:
+            longueur += 2
+        longueur += 2 if mode_adresse_src == 2 else 8
+    return longueur
+
+
+def decrypter_payload_zigbee(octets_trame, cle_hex, avec_fcs=True):
+    """
+    Déchiffre et authentifie le payload d'une trame ZigBee sécurisée au niveau réseau.
+
+    Le déchiffrement suit le mode CCM* de ZigBee PRO (niveau 5, MIC de 4 octets) :
+    le nonce est formé de l'adresse IEEE source, du frame counter et du champ de contrôle
+    de sécurité, et l'en-tête réseau ainsi que l'en-tête auxiliaire de sécurité sont
+    authentifiés. Lorsque le paquet cryptography est installé, le déchiffrement est confié
+    à son AESCCM (OpenSSL) ; sinon CCM* est déroulé sur un contexte AES-ECB réutilisé d'une
+    trame à l'autre (voir `contexte_aes`). Dans les deux cas la clé n'est expansée qu'une fois.
+
+    Paramètres
+    ----------
+    octets_trame : bytes
+        La trame MAC complète, telle que capturée.
+    cle_hex : str
+        Clé réseau AES-128 au format hexadécimal.
+    avec_fcs : bool, optionnel
+        Indique si la trame se termine par les 2 octets de FCS (cas des captures série).
+        Par défaut True.
+
+    Retours
+    -------
+    dict
+        {'succes': True, 'payload': <payload déchiffré en hexadécimal>} si le MIC est valide,
+        {'succes': False, 'erreur': <message>} sinon, y compris si la clé est invalide.
+    """
+    try:
+        aes = contexte_aes(cle_hex)
+        ccm = contexte_ccm(cle_hex)
+    except ValueError as e:
+        return {'succes': False, 'erreur': f"Clé de déchiffrement invalide : {e}"}
+    return _dechiffrer_trame(octets_trame, aes, avec_fcs, ccm)
+
+
+def _analyser_trame_securisee(octets_trame, avec_fcs):
+    """
+    Extrait d'une trame sécurisée au niveau réseau les entrées de CCM*.
+
+    Retours
+    -------
+    tuple or dict
+        (nonce, donnees_authentifiees, chiffre_et_mic) : le nonce et les données authentifiées
+        portent le niveau de sécurité réel (5) ; ou un dict {'succes': False, 'erreur': ...}
+        si la trame ne peut pas être déchiffrée.
+    """
+    if avec_fcs:
+        octets_trame = octets_trame[:-2]
+    try:
+        debut_reseau = _longueur_entete_mac(octets_trame)
+        controle_reseau = int.from_bytes(octets_trame[debut_reseau:debut_reseau + 2], 'little')
+        if not controle_reseau & (1 << 9):
+            return {'succes': False, 'erreur': "Trame non sécurisée au niveau réseau"}
+
+        # En-tête réseau : champ de contrôle, adresses courtes, rayon et numéro de séquence,
+        # puis champs optionnels selon les bits du champ de contrôle
+        offset = debut_reseau + 8
+        if controle_reseau & (1 << 11):  # Adresse IEEE de destination
+            offset += 8
+        source_ieee = None
+        if controle_reseau & (1 << 12):  # Adresse IEEE source
+            source_ieee = octets_trame[offset:offset + 8]
+            offset += 8
+        if controle_reseau & (1 << 8):  # Contrôle multicast
+            offset += 1
+        if controle_reseau & (1 << 10):  # Sous-trame de routage par la source
+            offset += 2 + 2 * octets_trame[offset]
+
+        # En-tête auxiliaire de sécurité
+        debut_securite = offset
+        controle_securite = octets_trame[offset]
+        compteur = octets_trame[offset + 1:offset + 5]
+        offset += 5
+        if controle_securite & 0x20:  # Extended nonce : adresse source incluse
+            source_ieee = octets_trame[offset:offset + 8]
+            offset += 8
+        if (controle_securite >> 3) & 0x03 == 1:  # Clé réseau : numéro de séquence de clé
+            offset += 1
+        if source_ieee is None or len(source_ieee) != 8:
+            return {'succes': False, 'erreur': "Adresse IEEE source absente de la trame"}
+
+        if offset > len(octets_trame) - LONGUEUR_MIC:
+            return {'succes': False, 'erreur': "Trame trop courte"}
+    except IndexError:
+        return {'succes': False, 'erreur': "Trame trop courte"}
+
+    controle_securite = (controle_securite & ~0x07) | NIVEAU_SECURITE_ZIGBEE
+    nonce = source_ieee + compteur + bytes((controle_securite,))
+    donnees_authentifiees = bytearray(octets_trame[debut_reseau:offset])
+    donnees_authentifiees[debut_securite - debut_reseau] = controle_securite
+    return nonce, bytes(donnees_authentifiees), octets_trame[offset:]
+
+
+def _bloc_b0(nonce, longueur, donnees_authentifiees):
+    """
+    Construit le premier bloc B_0 du CBC-MAC de CCM* : drapeaux (présence de données
+    authentifiées, taille du MIC, taille du champ de longueur), nonce et longueur du message.
+    """
+    drapeaux = (0x40 if donnees_authentifiees else 0) | ((LONGUEUR_MIC - 2) // 2) << 3 | 0x01
+    return bytes((drapeaux,)) + nonce + longueur.to_bytes(2, 'big')
+
+
+def _entete_donnees_authentifiees(donnees_authentifiees):
+    """
+    Préfixe les données authentifiées de leur longueur sur 2 octets ; rien si elles sont vides.
+    """
+    if not donnees_authentifiees:
+        return b''
+    return len(donnees_authentifiees).to_bytes(2, 'big') + donnees_authentifiees
+
+
+def _dechiffrer_ccm_logiciel(aes, nonce, donnees_authentifiees, chiffre_et_mic):
+    """
+    Déroule CCM* sur le contexte AES-ECB `aes` pour une seule trame.
+    """
+    chiffre = chiffre_et_mic[:-LONGUEUR_MIC]
+    longueur = len(chiffre)
+
+    # Flux de clé CTR (blocs A_0..A_n) chiffré en un seul appel
+    nb_blocs = (longueur + 15) // 16
+    flux = aes.encrypt(b''.join(
+        b'\x01' + nonce + i.to_bytes(2, 'big') for i in range(nb_blocs + 1)
+    ))
+    clair = bytes(c ^ k for c, k in zip(chiffre, flux[16:]))
+
+    # CBC-MAC sur B_0, les données authentifiées puis le texte clair, chacun complété à 16 octets
+    b0 = _bloc_b0(nonce, longueur, donnees_authentifiees)
+    entete = _entete_donnees_authentifiees(donnees_authentifiees)
+    blocs = b0 + entete + bytes(-len(entete) % 16) + clair + bytes(-longueur % 16)
+    x = 0
+    for i in range(0, len(blocs), 16):
+        x = int.from_bytes(aes.encrypt((x ^ int.from_bytes(blocs[i:i + 16], 'big')).to_bytes(16, 'big')), 'big')
+    mic_calcule = bytes(t ^ k for t, k in zip(x.to_bytes(16, 'big')[:LONGUEUR_MIC], flux))
+
+    if not hmac.compare_digest(mic_calcule, chiffre_et_mic[-LONGUEUR_MIC:]):
+        return {'succes': False, 'erreur': "MIC invalide"}
+    return {'succes': True, 'payload': clair.hex()}
+
+
+def _dechiffrer_lot_logiciel(aes, elements):
+    """
+    Déroule CCM* sur le contexte AES-ECB `aes` pour plusieurs trames à la fois.
+
+    Équivalent par lot de `_dechiffrer_ccm_logiciel`, dont les appels au contexte AES sont
+    regroupés sur tout le lot : le flux de clé CTR de toutes les trames est chiffré en un
+    seul appel, puis le CBC-MAC avance au même rythme sur toutes les trames, un appel par
+    rang de bloc. Le coût fixe de chaque appel à Cryptodome est ainsi partagé entre les
+    trames au lieu d'être payé bloc par bloc.
+
+    Paramètres
+    ----------
+    aes : object
+        Contexte AES-ECB (voir `contexte_aes`).
+    elements : list
+        Tuples (nonce, donnees_authentifiees, chiffre_et_mic) de `_analyser_trame_securisee`.
+
     Retours
     -------
     list
-        Liste des chemins d'accès aux périphériques série trouvés.
+        Un résultat par élément, au même format que `decrypter_payload_zigbee`.
     """
-    return glob.glob('/dev/tty*')
+    # Flux de clé CTR (blocs A_0..A_n de chaque trame) chiffré en un seul appel
+    compteurs = []
+    for nonce, _, chiffre_et_mic in elements:
+        nb_blocs = (len(chiffre_et_mic) - LONGUEUR_MIC + 15) // 16
+        compteurs.append(b''.join(b'\x01' + nonce + i.to_bytes(2, 'big') for i in range(nb_blocs + 1)))
+    flux_lot = aes.encrypt(b''.join(compteurs))
+
+    # Déchiffrement, puis blocs du CBC-MAC de chaque trame : B_0, les données authentifiées
+    # puis le texte clair, chacun complété à 16 octets
+    clairs, flux_mic, blocs_mac = [], [], []
+    position = 0
+    for (nonce, donnees_authentifiees, chiffre_et_mic), bloc_compteurs in zip(elements, compteurs):
+        flux = flux_lot[position:position + len(bloc_compteurs)]
+        position += len(bloc_compteurs)
+        longueur = len(chiffre_et_mic) - LONGUEUR_MIC
+        clair = (int.from_bytes(chiffre_et_mic[:longueur], 'big')
+                 ^ int.from_bytes(flux[16:16 + longueur], 'big')).to_bytes(longueur, 'big')
+        clairs.append(clair)
+        flux_mic.append(flux[:LONGUEUR_MIC])
+        b0 = _bloc_b0(nonce, longueur, donnees_authentifiees)
+        entete = _entete_donnees_authentifiees(donnees_authentifiees)
+        blocs_mac.append(b0 + entete + bytes(-len(entete) % 16) + clair + bytes(-longueur % 16))
+
+    # CBC-MAC mené de front sur toutes les trames : un appel AES par rang de bloc
+    etats = [0] * len(elements)
+    for debut in range(0, max(map(len, blocs_mac), default=0), 16):
+        actives = [i for i, blocs in enumerate(blocs_mac) if len(blocs) > debut]
+        sortie = aes.encrypt(b''.join(
+            (etats[i] ^ int.from_bytes(blocs_mac[i][debut:debut + 16], 'big')).to_bytes(16, 'big')
+            for i in actives
+        ))
+        for rang, i in enumerate(actives):
+            etats[i] = int.from_bytes(sortie[16 * rang:16 * rang + 16], 'big')
+
+    resultats = []
+    for (_, _, chiffre_et_mic), clair, flux, etat in zip(elements, clairs, flux_mic, etats):
+        mic_calcule = bytes(t ^ k for t, k in zip(etat.to_bytes(16, 'big')[:LONGUEUR_MIC], flux))
+        if hmac.compare_digest(mic_calcule, chiffre_et_mic[-LONGUEUR_MIC:]):
+            resultats.append({'succes': True, 'payload': clair.hex()})
+        else:
+            resultats.append({'succes': False, 'erreur': "MIC invalide"})
+    return resultats
+
+
+def _dechiffrer_trame(octets_trame, aes, avec_fcs, ccm=None):
+    """
+    Déchiffre une trame avec des contextes déjà construits : AESCCM (`ccm`) s'il est fourni,
+    sinon CCM* déroulé sur le contexte AES-ECB `aes`.
+    """
+    elements = _analyser_trame_securisee(octets_trame, avec_fcs)
+    if isinstance(elements, dict):
+        return elements
+    if ccm is not None:
+        nonce, donnees_authentifiees, chiffre_et_mic = elements
+        try:
+            clair = ccm.decrypt(nonce, chiffre_et_mic, donnees_authentifiees)
+        except InvalidTag:
+            return {'succes': False, 'erreur': "MIC invalide"}
+        return {'succes': True, 'payload': clair.hex()}
+    return _dechiffrer_ccm_logiciel(aes, *elements)
+
+
+def decrypter_payloads_batch(payloads_hex, cle_hex, avec_fcs=True):
+    """
+    Déchiffre un lot de trames ZigBee sécurisées avec la même clé réseau.
+
+    Les contextes AES sont résolus une seule fois pour tout le lot et les trames sont
+    converties depuis l'hexadécimal en une passe, de sorte que le coût fixe par appel
+    (recherche du contexte, conversions, appels de fonction) est amorti sur N trames.
+    Sans le paquet cryptography, les appels AES eux-mêmes sont regroupés sur tout le lot
+    (voir `_dechiffrer_lot_logiciel`).
+
+    Paramètres
+    ----------
+    payloads_hex : list
+        Trames MAC complètes, en hexadécimal (les objets bytes sont acceptés tels quels).
+    cle_hex : str
+        Clé réseau AES-128 au format hexadécimal.
+    avec_fcs : bool, optionnel
+        Indique si les trames se terminent par les 2 octets de FCS. Par défaut True.
+
+    Retours
+    -------
+    list
+        Un résultat par trame, dans l'ordre, au même format que `decrypter_payload_zigbee`.
+        Si la clé est invalide, chaque trame reçoit le même résultat d'erreur.
+    """
+    try:
+        aes = contexte_aes(cle_hex)
+        ccm = contexte_ccm(cle_hex)
+    except ValueError as e:
+        return [{'succes': False, 'erreur': f"Clé de déchiffrement invalide : {e}"} for _ in payloads_hex]
+    trames = [bytes.fromhex(p) if isinstance(p, str) else p for p in payloads_hex]
+    if ccm is not None:
+        return [_dechiffrer_trame(trame, aes, avec_fcs, ccm) for trame in trames]
+
+    # Les trames déchiffrables sont traitées ensemble, les autres gardent leur erreur
+    resultats = [_analyser_trame_securisee(trame, avec_fcs) for trame in trames]
+    indices = [i for i, resultat in enumerate(resultats) if not isinstance(resultat, dict)]
+    if indices:
+        dechiffres = _dechiffrer_lot_logiciel(aes, [resultats[i] for i in indices])
+        for i, resultat in zip(indices, dechiffres):
+            resultats[i] = resultat
+    return resultats
 
 
 class SniffeurZigbee:
@@ -75,7 +658,10 @@ class SniffeurZigbee:
     vitesse_bauds : int, optionnel
         Vitesse de transmission du port série (par défaut 115200).
     format_sortie : str, optionnel
-        Format du fichier de sortie ('json' ou 'pcap', par défaut 'json').
+        Format du fichier de sortie ('json', 'pcap' ou 'pickle', par défaut 'json').
+    max_captures : int, optionnel
+        Nombre maximal de trames décodées conservées en mémoire (par défaut 10 000) ;
+        au-delà, les plus anciennes sont écartées. None pour ne pas borner.
 
     Attributs
     ----------
@@ -86,38 +672,119 @@ class SniffeurZigbee:
     vitesse_bauds : int
         Vitesse de transmission en bauds.
     format_sortie : str
-        Format du fichier de sortie choisi ('json' ou 'pcap').
-    file_paquets : Queue
-        File d'attente utilisée pour stocker les paquets bruts capturés.
+        Format du fichier de sortie choisi ('json', 'pcap' ou 'pickle').
+    file_paquets : queue.SimpleQueue
+        File d'attente entre les threads de capture et de traitement ; chaque élément est
+        la liste des lignes brutes (bytes) extraites d'une même lecture du port série.
+        Implémentée en C, elle ne prend qu'un verrou interne par opération, sans la
+        Condition Python de queue.Queue ; sa taille est bornée par le producteur
+        (TAILLE_MAX_FILE_PAQUETS lots).
     est_en_cours : bool
         Indique si le sniffer est en cours d'exécution.
     port_serie : serial.Serial
         Instance du port série configuré pour la capture.
     interface : str
         Nom du périphérique série sélectionné.
-    captures : list
-        Liste des trames ZigBee décodées et leurs métadonnées associées.
+    captures : collections.deque
+        Trames ZigBee décodées et leurs métadonnées associées, dans l'ordre d'arrivée,
+        bornées à `max_captures` éléments. Un consommateur peut les retirer au fil de l'eau
+        avec `popleft()`.
     cle_dechiffrement : str
-        Clé utilisée pour le déchiffrement des trames, si nécessaire.
+        Clé réseau (hexadécimal) utilisée pour déchiffrer les trames sécurisées ;
+        le résultat est ajouté à la trame décodée sous la clé 'dechiffrement'.
     metadonnees : list
         Liste des métadonnées associées aux captures.
+    nouvelle_capture : threading.Event
+        Événement signalé à chaque ajout d'une trame dans la liste des captures,
+        permettant aux consommateurs d'attendre sans interroger la liste en boucle.
+    flux_jsonl : bool
+        Si True, chaque trame publiée est aussi ajoutée pendant la capture à un fichier
+        .jsonl (voir `_ouvrir_fichier_jsonl`). Désactivé par défaut ; option --jsonl en
+        ligne de commande.
+    coeurs_threads : tuple or None
+        Cœurs CPU (capture, traitement) sur lesquels les threads s'épinglent, définis
+        par `definir_coeurs_threads`.
     """
 
-    def __init__(self, canal=13, fichier_sortie='captures_zigbee.json', vitesse_bauds=115200, format_sortie='json',materiel='nrf52'):
+    def __init__(self, canal=13, fichier_sortie='captures_zigbee.json', vitesse_bauds=115200, format_sortie='json',materiel='nrf52', max_captures=10000, coeurs_threads=None):
+        # Capacités du processeur sondées une fois (résultats mis en cache par module)
+        self._has_aesni = aes_ni_disponible()
+        self._has_pclmulqdq = pclmulqdq_disponible()
+        if self._has_aesni is False:
+            logger.warning("AES-NI non disponible : le déchiffrement des trames se fera en AES logiciel, plus lent.")
         self.canal = canal
         self.fichier_sortie = fichier_sortie
         self.vitesse_bauds = vitesse_bauds
         self.format_sortie = format_sortie
-        self.file_paquets = queue.Queue(maxsize=1000)
+        self.file_paquets = queue.SimpleQueue()
+        self._thread_capture = None
+        self._thread_traitement = None
         self.est_en_cours = False
         self.port_serie = None
         self.interface = self._selectionner_interface()
-        self.captures = []
+        self.max_captures = max_captures
+        self.captures = collections.deque(maxlen=max_captures)
+        self.nouvelle_capture = threading.Event()
         self.cle_dechiffrement = ""
+        # Cœurs CPU (capture, traitement) sur lesquels épingler les threads ; None : pas d'épinglage
+        self.coeurs_threads = None
+        self.definir_coeurs_threads(coeurs_threads)
+        # Priorité SCHED_FIFO du thread de capture ; None : ordonnancement normal
+        self.priorite_capture = None
+        self._trames_en_attente = []
         self.metadonnees = []
         self.pcap_writer = None
+        self._trames_pcap_non_videes = 0
+        # Écriture des trames au fil de la capture dans un fichier .jsonl (captures autonomes)
+        self.flux_jsonl = False
+        self._fichier_jsonl = None
         self.materiel = materiel
 
+    def capabilities(self):
+        """
+        Retourne les capacités matérielles et logicielles utilisées par le déchiffrement.
+
+        Retours
+        -------
+        dict
+            - 'aes_ni' : instructions AES-NI présentes (None si la détection est impossible)
+            - 'pclmulqdq' : instruction PCLMULQDQ présente (None si la détection est impossible)
+            - 'aesccm' : CCM en C disponible via le paquet cryptography
+        """
+        return {
+            'aes_ni': self._has_aesni,
+            'pclmulqdq': self._has_pclmulqdq,
+            'aesccm': AESCCM is not None,
+        }
+
+    def definir_coeurs_threads(self, coeurs):
+        """
+        Définit les cœurs CPU sur lesquels épingler les threads de capture et de traitement.
+
+        Paramètres
+        ----------
+        coeurs : sequence of int or None
+            Deux cœurs (capture, traitement), ou un seul cœur partagé par les deux threads.
+            None ou une séquence vide désactive l'épinglage.
+
+        Notes
+        -----
+        Une valeur invalide (plus de deux cœurs, numéro non entier ou négatif) est ignorée
+        avec un avertissement, et l'épinglage est désactivé. Le réglage s'applique au
+        prochain démarrage du sniffer.
+        """
+        if not coeurs:
+            self.coeurs_threads = None
+            return
+        coeurs = tuple(coeurs)
+        if (len(coeurs) > 2
+                or not all(isinstance(coeur, int) and not isinstance(coeur, bool) and coeur >= 0
+                           for coeur in coeurs)):
+            logger.warning("Cœurs CPU invalides : %r. Les threads ne seront pas épinglés.", coeurs)
+            self.coeurs_threads = None
+            return
+        self.coeurs_threads = coeurs if len(coeurs) == 2 else coeurs * 2
+
     def definir_materiel(self, materiel):
         """
     Définit le materiel utilisé pour les trames capturées à partir du port série.
@@ -145,12 +812,12 @@ class SniffeurZigbee:
     >>> sniffer.definir_format_entree('esp32h2')  # Configure le sniffeur pour les trames ESP32H2
     """
         if materiel.lower() not in ['nrf52', 'esp32h2']:
-            logger.warning(f"Format d'entrée non pris en charge: {materiel}. Utilisation de 'nrf52'.")
+            logger.warning("Format d'entrée non pris en charge: %s. Utilisation de 'nrf52'.", materiel)
             self.materiel = 'nrf52'
         else:
             self.materiel = materiel.lower()
             
-        logger.info(f"Format d'entrée défini sur {self.materiel}")
+        logger.info("Format d'entrée défini sur %s", self.materiel)
 
     def reinitialiser(self):
         """
@@ -159,20 +826,42 @@ class SniffeurZigbee:
         Cette méthode vide la liste des captures, la file d'attente des paquets
         ainsi que les métadonnées accumulées. Si le port série est ouvert, elle 
         réinitialise également ses buffers d'entrée et de sortie.
+
+        Les buffers du port série sont vidés en premier, de sorte qu'une seule passe
+        suffise ensuite pour vider la file et les captures.
         """
-        self.captures.clear()
-        self.file_paquets.queue.clear()
-        self.metadonnees.clear()
-        
         try:
             if self.port_serie and self.port_serie.is_open:
                 self.port_serie.reset_input_buffer()  
                 self.port_serie.reset_output_buffer()
-                with self.file_paquets.mutex:
-                    self.file_paquets.queue.clear()
-                self.captures.clear()
         except Exception as e:
-            logger.error(f"Erreur lors de la réinitialisation du sniffer : {e}")
+            logger.error("Erreur lors de la réinitialisation du sniffer : %s", e)
+
+        self._vider_file_paquets()
+        self.captures.clear()
+        self.nouvelle_capture.clear()
+        self._trames_en_attente.clear()
+        self.metadonnees.clear()
+
+    def _vider_file_paquets(self):
+        """
+        Vide la file des paquets en attente de traitement.
+
+        Si le sniffer est arrêté alors que le thread de traitement n'a pas encore reçu
+        son marqueur de fin, celui-ci est redéposé pour que le thread se termine.
+
+        La file est vidée élément par élément (SimpleQueue n'expose pas son contenu) ;
+        aucun producteur ne peut y être bloqué, `put` ne bloquant jamais.
+        """
+        retirer = self.file_paquets.get_nowait
+        try:
+            while True:
+                retirer()
+        except queue.Empty:
+            pass
+        if (not self.est_en_cours and self._thread_traitement is not None
+                and self._thread_traitement.is_alive()):
+            self.file_paquets.put(FIN_TRAITEMENT)
 
     def _selectionner_interface(self):
         """
@@ -195,7 +884,7 @@ class SniffeurZigbee:
         peripheriques = trouver_peripheriques_serie()
         if not peripheriques:
             raise RuntimeError("Aucun périphérique série USB trouvé")
-        logger.info(f"Périphériques disponibles : {peripheriques}")
+        logger.info("Périphériques disponibles : %s", peripheriques)
         return '/dev/ttyUSB0'  # Ou peripheriques[0] pour utiliser le premier trouvé
 
     def _configurer_sniffer(self):
@@ -212,45 +901,100 @@ class SniffeurZigbee:
         """
         try:
             self.port_serie = serial.Serial(self.interface, baudrate=self.vitesse_bauds, timeout=1)
+            self._regler_reception_port_serie()
             self.port_serie.reset_input_buffer()
-            logger.info(f"Configuration du sniffer sur {self.interface}")
+            logger.info("Configuration du sniffer sur %s", self.interface)
             
             # Configurer le canal de capture
             self._configurer_canal()
             if self.materiel == 'esp32h2':
                 #Envoie sur le port serie la commande pour activer le mode sniffer
-                self.port_serie.write(bytes("#CMD#MODE_SNIFF",'utf-8'))
-                print("Mode sniffer activé")
+                self.port_serie.write(COMMANDE_MODE_SNIFF)
+                logger.info("Mode sniffer activé")
             
         except serial.SerialException as e:
-            logger.error(f"Erreur de configuration du sniffer : {e}")
+            logger.error("Erreur de configuration du sniffer : %s", e)
             self._fermer_port_serie()
             raise
 
+    def _regler_reception_port_serie(self):
+        """
+        Adapte la réception du port série aux rafales de trames.
+
+        Sous Windows, le tampon de réception du pilote est porté à TAILLE_TAMPON_RECEPTION
+        octets, de quoi absorber une rafale pendant que le thread de capture est préempté.
+        Sous Linux, la taille de ce tampon est fixée par le pilote : le mode faible latence
+        (drapeau ASYNC_LOW_LATENCY) est activé à la place, pour que les octets reçus soient
+        remis au fil de l'eau plutôt que par paquets espacés.
+
+        Notes
+        -----
+        Les deux réglages sont facultatifs : un pilote qui les refuse (CDC-ACM, pseudo-terminal)
+        laisse le port dans sa configuration par défaut.
+        """
+        port = self.port_serie
+        if hasattr(port, 'set_buffer_size'):
+            try:
+                port.set_buffer_size(rx_size=TAILLE_TAMPON_RECEPTION)
+            except (serial.SerialException, ValueError) as e:
+                logger.debug("Tampon de réception inchangé : %s", e)
+        if hasattr(port, 'set_low_latency_mode'):
+            try:
+                port.set_low_latency_mode(True)
+            except (OSError, ValueError) as e:
+                logger.debug("Mode faible latence non disponible : %s", e)
+
     def _configurer_canal(self):
         """
         Configure le canal de capture ZigBee sur le périphérique.
         
         Cette méthode envoie une commande au périphérique pour définir
         le canal ZigBee à utiliser pour la capture.
+        Les réponses sont lues dès leur arrivée : l'attente s'arrête sur la première ligne
+        (hors trame capturée) contenant le numéro du canal, comme "OK <canal>", ou au plus
+        tard après DELAI_REPONSE_CANAL secondes si le périphérique ne répond pas. Le délai de
+        lecture du port est fixé une seule fois pour l'attente, puis restauré.
+
+        Le firmware ESP32H2 n'a pas de commande CHANNEL (son canal est fixé à la compilation) :
+        aucun acquittement n'est attendu pour ce matériel.
         """
         try:
             # Vérifier que le canal est valide (11-26 pour ZigBee)
             if not (11 <= self.canal <= 26):
-                logger.warning(f"Canal {self.canal} hors plage, utilisation du canal 13 par défaut")
+                logger.warning("Canal %s hors plage, utilisation du canal 13 par défaut", self.canal)
                 self.canal = 13
             
             # Envoyer la commande au périphérique pour configurer le canal
             # Format de commande dépend du firmware du périphérique
             commande = f"CHANNEL {self.canal}\r\n".encode('utf-8')
             self.port_serie.write(commande)
-            time.sleep(0.5)  # Laisser le temps au périphérique de traiter la commande
+            if self.materiel == 'esp32h2':
+                return
+            
+            # Lecture des réponses dès leur arrivée, jusqu'à celle qui confirme le canal
+            # ou jusqu'à DELAI_REPONSE_CANAL secondes, au lieu d'une attente fixe ; chaque
+            # lecture est bornée à DELAI_SELECTION pour revérifier l'échéance
+            numero_canal = b"%d" % self.canal
+            delai_initial = self.port_serie.timeout
+            self.port_serie.timeout = DELAI_SELECTION
+            echeance = time.monotonic() + DELAI_REPONSE_CANAL
+            reponse = b""
+            try:
+                while time.monotonic() < echeance:
+                    ligne = self.port_serie.read_until(b'\n')
+                    if not ligne.strip():
+                        continue
+                    reponse = ligne
+                    if (not ligne.startswith(PREFIXE_NRF52)
+                            and numero_canal in re.findall(rb"\d+", ligne)):
+                        break
+            finally:
+                self.port_serie.timeout = delai_initial
             
-            reponse = self.port_serie.readline().decode('utf-8').strip()
-            logger.info(f"Configuration du canal {self.canal}: {reponse}")
+            logger.info("Configuration du canal %s: %s", self.canal, reponse.decode('utf-8', errors='replace').strip())
             
         except Exception as e:
-            logger.error(f"Erreur lors de la configuration du canal: {e}")
+            logger.error("Erreur lors de la configuration du canal: %s", e)
 
     def definir_canal(self, nouveau_canal):
         """
@@ -265,16 +1009,16 @@ class SniffeurZigbee:
             Le nouveau canal ZigBee à utiliser (11-26).
         """
         if not (11 <= nouveau_canal <= 26):
-            logger.warning(f"Canal {nouveau_canal} invalide. Utilisation de la plage 11-26 uniquement.")
+            logger.warning("Canal %s invalide. Utilisation de la plage 11-26 uniquement.", nouveau_canal)
             return
             
         etait_en_cours = self.est_en_cours
         if etait_en_cours:
+            # L'arrêt attend la fin des threads : le thread de capture ferme le port en se terminant
             self.arreter_sniffer()
-            time.sleep(1)  # Attendre l'arrêt complet
             
         self.canal = nouveau_canal
-        logger.info(f"Canal modifié: {self.canal}")
+        logger.info("Canal modifié: %s", self.canal)
         
         if etait_en_cours:
             self.demarrer_sniffer()
@@ -301,57 +1045,148 @@ class SniffeurZigbee:
     au format d'entrée configuré avant de l'ajouter à la file.
     
     Mécanismes de vérification appliqués:
-    - Pour le format 'nrf52': vérifie que la chaîne contient "received:"
-    - Pour le format 'esp32h2': vérifie que la chaîne contient "]" et a une longueur > 10
+    - Pour le format 'nrf52': vérifie que la ligne commence par b"received:"
+    - Pour le format 'esp32h2': vérifie que la ligne contient b"]" et a une longueur > 10
+    
+    Lorsque le port expose un descripteur de fichier (POSIX), le thread se bloque dans
+    `selectors` jusqu'à ce que des données soient lisibles, au plus DELAI_SELECTION secondes
+    pour revérifier la condition d'arrêt, puis lit jusqu'à TAILLE_LECTURE octets par un
+    unique `os.read` : ni ioctl `in_waiting` ni couche de lecture de pyserial par rafale.
+    Sans descripteur (Windows), la lecture pyserial elle-même est bloquante : le délai du
+    port est ramené à DELAI_SELECTION et chaque tour lit tout ce qui est disponible, ou
+    attend au moins un octet. Aucune attente active, ni mise en sommeil fixe, au repos.
+    
+    Les données sont accumulées par blocs (tout ce que contient le tampon du pilote) dans un
+    bytearray, puis découpées en lignes sur b'\\n'. Les lignes restent en octets : le décodage
+    en texte est reporté au thread de traitement, hors du chemin critique de la capture.
     
     Gestion d'erreurs:
-    - Les erreurs de décodage Unicode sont traitées avec l'option 'errors=replace' et journalisées
-    - Les exceptions de port série entraînent l'arrêt de la capture
+    - Un tampon dépassant TAILLE_MAX_LIGNE octets sans fin de ligne est vidé et journalisé
+    - Les exceptions de port série (y compris les OSError de `os.read`, et un port lisible
+      qui ne renvoie aucune donnée, signe d'un périphérique déconnecté) entraînent l'arrêt
+      de la capture
     - Si la file de paquets est pleine, les paquets sont ignorés et un avertissement est journalisé
     
     Notes
     -----
     Cette méthode nettoie les buffers d'entrée/sortie au démarrage pour éviter de
     traiter des données partielles ou obsolètes.
+
+    Si `coeurs_threads` est défini, le thread s'épingle d'abord sur le premier cœur indiqué.
+    Si `priorite_capture` est défini, il passe en SCHED_FIFO avec cette priorité (voir
+    `_elever_priorite_thread` pour la capacité CAP_SYS_NICE requise).
     
     Le port série est toujours fermé proprement dans le bloc 'finally', quelle que soit
-    la raison de l'arrêt de la méthode.
+    la raison de l'arrêt de la méthode. Le thread ne ferme que le port ouvert pour sa
+    capture, même si `port_serie` désigne déjà celui d'un redémarrage.
     """
+        port = self.port_serie
+        selecteur = None
+        if self.coeurs_threads:
+            _epingler_thread(self.coeurs_threads[0])
+        _elever_priorite_thread(self.priorite_capture)
         try:
-            logger.info(f"Début de capture sur {self.interface}, canal {self.canal}, format d'entrée: {self.materiel}")
+            logger.info("Début de capture sur %s, canal %s, format d'entrée: %s", self.interface, self.canal, self.materiel)
             # Vider les buffers avant de démarrer
-            self.port_serie.reset_input_buffer()
-            self.port_serie.reset_output_buffer()
+            port.reset_input_buffer()
+            port.reset_output_buffer()
+            tampon = bytearray()
+            selecteur = self._selecteur_port_serie(port)
+            fd = port.fileno() if selecteur is not None else None
+            if selecteur is None:
+                # Lecture bloquante de pyserial, bornée pour revérifier la condition d'arrêt
+                port.timeout = DELAI_SELECTION
+            # Méthodes appelées à chaque tour, résolues une fois pour toutes
+            attendre = selecteur.select if selecteur is not None else None
+            lire = os.read
+            mettre_en_file = self.file_paquets.put
+            taille_file = self.file_paquets.qsize
             while self.est_en_cours:
-                if self.port_serie.in_waiting:
+                if attendre is not None:
+                    # Attente bloquante sur le descripteur puis lecture directe par os.read :
+                    # un seul appel système pour toute la rafale, sans ioctl in_waiting
+                    if not attendre(timeout=DELAI_SELECTION):
+                        continue
                     try:
-                        donnees_brutes = self.port_serie.readline().decode('utf-8', errors='replace').strip()
-                        
-                        # Vérifier si les données sont au format attendu avant de les mettre en file
-                        if self.materiel == 'nrf52' and donnees_brutes and "received:" in donnees_brutes:
-                            try:
-                                self.file_paquets.put_nowait(donnees_brutes)
-                            except queue.Full:
-                                logger.warning("File de paquets pleine, paquet ignoré.")
-                        elif self.materiel == 'esp32h2' and donnees_brutes and "]" in donnees_brutes and len(donnees_brutes) > 10:
-                            try:
-                                self.file_paquets.put_nowait(donnees_brutes)
-                            except queue.Full:
-                                logger.warning("File de paquets pleine, paquet ignoré.")
-                    except UnicodeDecodeError as e:
-                        logger.warning(f"Erreur de décodage des données série: {e}")
-                        self.port_serie.reset_input_buffer()
-        except serial.SerialException as e:
-            logger.error(f"Erreur de port série : {e}")
+                        donnees = lire(fd, TAILLE_LECTURE)
+                    except BlockingIOError:
+                        continue
+                    if not donnees:
+                        raise serial.SerialException(
+                            "Le port signale des données à lire mais n'en renvoie aucune "
+                            "(périphérique déconnecté ?)"
+                        )
+                else:
+                    # Tout le contenu du tampon du pilote, ou attente bloquante du premier octet
+                    donnees = port.read(port.in_waiting or 1)
+                    if not donnees:
+                        continue
+
+                # Seules les lignes complètes sont extraites, le reste attend la lecture suivante
+                tampon += donnees
+                fin = tampon.rfind(b'\n')
+                if fin < 0:
+                    if len(tampon) > TAILLE_MAX_LIGNE:
+                        logger.warning("Données série sans fin de ligne, tampon vidé.")
+                        tampon.clear()
+                    continue
+                lignes = tampon[:fin].split(b'\n')
+                del tampon[:fin + 1]
+
+                # Les lignes d'une même lecture sont transmises en un seul lot : un seul
+                # passage par la file (verrou, réveil du consommateur) par rafale
+                # Vérifier si les données sont au format attendu avant de les mettre en file ;
+                # le matériel n'est consulté qu'une fois par rafale
+                lot = []
+                ajouter = lot.append
+                if self.materiel == 'nrf52':
+                    # Un seul test ancré par ligne : le préfixe en tête de la ligne nettoyée
+                    for ligne in lignes:
+                        ligne = ligne.strip()
+                        if ligne.startswith(PREFIXE_NRF52):
+                            ajouter(bytes(ligne))
+                elif self.materiel == 'esp32h2':
+                    for ligne in lignes:
+                        ligne = ligne.strip()
+                        if b"]" in ligne and len(ligne) > 10:
+                            ajouter(bytes(ligne))
+                if lot:
+                    if taille_file() < TAILLE_MAX_FILE_PAQUETS:
+                        mettre_en_file(lot)
+                    else:
+                        logger.warning("File de paquets pleine, %d paquet(s) ignoré(s).", len(lot))
+        except (serial.SerialException, OSError) as e:
+            logger.error("Erreur de port série : %s", e)
         finally:
-            self._fermer_port_serie()
+            if selecteur is not None:
+                selecteur.close()
+            if port is not None and port.is_open:
+                port.close()
 
-    def _traiter_paquets(self, decoder=DecodeurTrameZigbee()):
+    def _selecteur_port_serie(self, port):
+        """
+        Enregistre le descripteur du port série `port` dans un sélecteur pour la lecture.
+
+        Retours
+        -------
+        selectors.BaseSelector or None
+            Sélecteur prêt à l'emploi, ou None si le port n'expose pas de descripteur
+            de fichier (cas de pyserial sous Windows).
+        """
+        try:
+            fd = port.fileno()
+        except (AttributeError, OSError, serial.SerialException):
+            return None
+        selecteur = selectors.DefaultSelector()
+        selecteur.register(fd, selectors.EVENT_READ)
+        return selecteur
+
+    def _traiter_paquets(self, decoder=None):
         """
     Traite les paquets capturés en les décodant et en les stockant dans la liste des captures.
     
     Cette méthode est conçue pour être exécutée dans un thread dédié, parallèlement à celui
-    qui capture les paquets. Elle récupère les paquets depuis la file d'attente, les décode
+    qui capture les paquets. Elle récupère les lots de paquets depuis la file d'attente, les décode
     en utilisant le décodeur fourni et stocke les résultats dans la liste des captures.
     
     Le traitement dépend du format d'entrée configuré ('nrf52' ou 'esp32h2') et utilise
@@ -365,29 +1200,124 @@ class SniffeurZigbee:
     
     Notes
     -----
-    - La méthode s'exécute en boucle tant que l'attribut 'est_en_cours' est True
-    - Un timeout est utilisé lors de la récupération des paquets pour permettre une
-      vérification régulière de la condition d'arrêt (est_en_cours)
+    - La méthode se bloque sur la file des paquets sans délai d'attente : elle ne se
+      réveille que pour traiter un paquet, et se termine à la réception du marqueur
+      FIN_TRAITEMENT déposé par `arreter_sniffer`
     - Les erreurs de traitement d'un paquet spécifique sont attrapées et journalisées,
       sans interrompre le traitement des autres paquets
-    - Les exceptions de type queue.Empty sont ignorées (timeout de récupération de paquet)
+    - Le décodeur par défaut est créé au démarrage du thread, et non à l'import du module
+    - Si une clé de déchiffrement est définie, les trames sont publiées par lots d'au plus
+      TAILLE_LOT_DECHIFFREMENT, ou dès que la file d'attente est vide
+    - Si `coeurs_threads` est défini, le thread s'épingle sur le second cœur indiqué, de
+      sorte que capture et traitement ne se disputent pas le même cœur ni ses caches
     """
-        while self.est_en_cours:
-            try:
-                paquet = self.file_paquets.get(timeout=1)
+        if self.coeurs_threads:
+            _epingler_thread(self.coeurs_threads[1])
+        if decoder is None:
+            decoder = DecodeurTrameZigbee()
+        # Méthodes appelées à chaque paquet, résolues une fois pour toutes
+        recevoir = self.file_paquets.get
+        file_vide = self.file_paquets.empty
+        while True:
+            lot = recevoir()
+            if lot is FIN_TRAITEMENT:
+                break
+            # Traitement selon le format d'entrée, choisi une fois par lot
+            if self.materiel == 'nrf52':
+                traiter = self._traiter_paquet_nrf52
+            elif self.materiel == 'esp32h2':
+                traiter = self._traiter_paquet_esp32h2
+            else:
+                logger.warning("materiel non reconnu: %s", self.materiel)
+                continue
+            for paquet in lot:
                 try:
-                    # Traitement selon le format d'entrée
-                    if self.materiel == 'nrf52':
-                        self._traiter_paquet_nrf52(paquet, decoder)
-                    elif self.materiel == 'esp32h2':
-                        self._traiter_paquet_esp32h2(paquet, decoder)
-                    else:
-                        logger.warning(f"materiel non reconnu: {self.materiel}")
+                    traiter(paquet, decoder)
                 except Exception as e:
-                    logger.error(f"Erreur lors du traitement du paquet : {e}", exc_info=True)
-            except queue.Empty:
-                pass
-    def _traiter_paquet_nrf(self, paquet, decoder):
+                    logger.error("Erreur lors du traitement du paquet : %s", e, exc_info=True)
+                # Déchiffrement groupé dès que le lot de trames est plein
+                if len(self._trames_en_attente) >= TAILLE_LOT_DECHIFFREMENT:
+                    self._publier_trames()
+            # ... ou dès que la rafale est épuisée
+            if self._trames_en_attente and file_vide():
+                self._publier_trames()
+        if self._trames_en_attente:
+            self._publier_trames()
+
+    def _enregistrer_trame(self, decoded_frame, paquet_bytes=None):
+        """
+        Ajoute une trame décodée aux captures.
+
+        Sans clé de déchiffrement, la trame est publiée immédiatement. Avec une clé, elle est
+        mise en attente avec ses octets bruts `paquet_bytes` pour être déchiffrée en lot par
+        `_publier_trames`, ce qui préserve l'ordre des captures et évite de reconvertir la
+        trame depuis l'hexadécimal.
+
+        La clé 'cle_filtre' (type de trame, cluster_id et command_id en minuscules) est
+        calculée ici une fois pour toutes, afin que les consommateurs filtrent les trames
+        par une simple comparaison de tuples. Une couche ou un champ absent (ou None) donne
+        une chaîne vide. Cette clé ne sert qu'en mémoire : elle est retirée des trames
+        sauvegardées (voir `_trame_a_sauvegarder`).
+        """
+        couche_aps = decoded_frame.get('couche_aps') or {}
+        couche_zcl = decoded_frame.get('couche_zcl') or {}
+        decoded_frame['cle_filtre'] = (
+            decoded_frame.get('type_trame'),
+            str(couche_aps.get('cluster_id') or '').lower(),
+            str(couche_zcl.get('command_id') or '').lower()
+        )
+        if self.cle_dechiffrement:
+            self._trames_en_attente.append((decoded_frame, paquet_bytes))
+        else:
+            self._publier((decoded_frame,))
+
+    @staticmethod
+    def _trame_a_sauvegarder(trame):
+        """
+        Retourne la trame telle qu'elle est écrite sur disque, sans la clé 'cle_filtre'.
+        """
+        if 'cle_filtre' not in trame:
+            return trame
+        return {cle: valeur for cle, valeur in trame.items() if cle != 'cle_filtre'}
+
+    def _publier_trames(self):
+        """
+        Déchiffre en un seul lot les trames sécurisées en attente puis les publie.
+
+        Le résultat de `decrypter_payloads_batch` est ajouté à chaque trame sécurisée
+        sous la clé 'dechiffrement'.
+        """
+        en_attente, self._trames_en_attente = self._trames_en_attente, []
+        securisees = [
+            (trame, paquet_bytes if paquet_bytes is not None else trame['metadonnees']['trame_brute'])
+            for trame, paquet_bytes in en_attente if 'security_header' in trame
+        ]
+        if securisees:
+            resultats = decrypter_payloads_batch(
+                [octets for _, octets in securisees],
+                self.cle_dechiffrement
+            )
+            for (trame, _), resultat in zip(securisees, resultats):
+                trame['dechiffrement'] = resultat
+        self._publier([trame for trame, _ in en_attente])
+
+    def _publier(self, trames):
+        """
+        Ajoute des trames prêtes aux captures et signale `nouvelle_capture`.
+
+        Si `flux_jsonl` est activé, chaque trame est aussi écrite pendant la capture dans le
+        fichier .jsonl, une trame JSON par ligne.
+        """
+        self.captures.extend(trames)
+        self.nouvelle_capture.set()
+        if self._fichier_jsonl is not None:
+            try:
+                a_sauvegarder = self._trame_a_sauvegarder
+                self._fichier_jsonl.write(b''.join(_json_dumps(a_sauvegarder(trame)) + b'\n' for trame in trames))
+            except Exception as e:
+                logger.error("Erreur lors de l'écriture des trames dans le fichier JSON: %s", e)
+
+    def _traiter_paquet_nrf52(self, paquet, decoder):
         """
     Traite un paquet au format nRF52840.
     
@@ -398,14 +1328,14 @@ class SniffeurZigbee:
     
     Paramètres
     ----------
-    paquet : str
-        Chaîne de caractères représentant le paquet à traiter au format nRF52840.
+    paquet : bytes
+        Ligne série représentant le paquet à traiter au format nRF52840.
     decoder : DecodeurTrameZigbee
         Instance de décodeur à utiliser pour interpréter la trame.
     
     Notes
     -----
-    Les métadonnées extraites incluent:
+    Les métadonnées extraites incluent (power, lqi et timestamp étant convertis en entiers):
     - power (RSSI): puissance du signal reçu en dBm
     - lqi: indicateur de qualité de la liaison
     - timestamp: horodatage de la capture
@@ -417,17 +1347,14 @@ class SniffeurZigbee:
     La méthode journalise un avertissement si la trame ne peut pas être décodée ou
     si le format du paquet ne correspond pas au format attendu.
     """
-        import re
-        pattern = r"received: ([0-9a-fA-F]+) power: ([-\d]+) lqi: (\d+) time: (\d+)"
-        match = re.search(pattern, paquet)
+        champs = _extraire_champs_nrf52(paquet)
         
-        if match:
-            paquet_received = match.group(1)
-            power = match.group(2)
-            lqi = match.group(3)
-            timestamp = match.group(4)
+        if champs:
+            trame_hex, power, lqi, timestamp = champs
             
-            paquet_bytes = bytes.fromhex(paquet_received)
+            # unhexlify lit directement les octets ASCII, sans passer par une str
+            paquet_bytes = unhexlify(trame_hex)
+            paquet_received = trame_hex.decode('ascii')
             
             metadonnees = {
                 'power': power,
@@ -444,11 +1371,11 @@ class SniffeurZigbee:
             decoded_frame = decoder.decoder_trame_zigbee(paquet_bytes)
             if decoded_frame:
                 decoded_frame['metadonnees'] = metadonnees
-                self.captures.append(decoded_frame)
+                self._enregistrer_trame(decoded_frame, paquet_bytes)
             else:
-                logger.warning(f"Impossible de décoder la trame : {paquet_received}")
-        else:
-            logger.warning(f"Format de paquet KillerBee non reconnu: {paquet}")
+                logger.warning("Impossible de décoder la trame : %s", paquet_received)
+        elif logger.isEnabledFor(logging.WARNING):
+            logger.warning("Format de paquet KillerBee non reconnu: %s", paquet.decode('utf-8', errors='replace'))
 
     def _traiter_paquet_esp32h2(self, paquet, decoder):
         """
@@ -463,16 +1390,16 @@ class SniffeurZigbee:
     
     Paramètres
     ----------
-    paquet : str
-        Chaîne de caractères représentant le paquet à traiter au format ESP32H2.
+    paquet : bytes
+        Ligne série représentant le paquet à traiter au format ESP32H2.
     decoder : DecodeurTrameZigbee
         Instance de décodeur à utiliser pour interpréter la trame.
     
     Notes
     -----
-    Les métadonnées extraites incluent:
+    Les métadonnées extraites incluent (valeurs numériques converties en entiers):
     - power (RSSI): puissance du signal reçu en dBm
-    - lqi: toujours défini à '0' car non fourni par l'ESP32H2
+    - lqi: toujours défini à 0 car non fourni par l'ESP32H2
     - timestamp: horodatage de la capture (généré par l'heure système actuelle)
     - trame_brute: données brutes de la trame en hexadécimal
     - canal: canal ZigBee utilisé
@@ -484,30 +1411,26 @@ class SniffeurZigbee:
     La méthode journalise un avertissement si la trame ne peut pas être décodée ou
     si le format du paquet ne correspond pas au format attendu.
     """
-        import re
-        # Pattern pour extraire les informations du format ESP32H2
-        pattern = r"\[\s*(\d+)\|RSSI:\s*([-\d]+)dB\|\s*(\d+)B\]\s*([0-9a-fA-F]+)"
-        match = re.search(pattern, paquet)
+        # Extraction des informations du format ESP32H2 (motif précompilé)
+        match = MOTIF_ESP32H2.search(paquet)
         
         if match:
-            sequence = match.group(1)
-            rssi = match.group(2)
-            taille = match.group(3)
-            trame_hex = match.group(4)
+            sequence, rssi, taille, trame_hex = match.groups()
             
-            paquet_bytes = bytes.fromhex(trame_hex)
+            paquet_bytes = unhexlify(trame_hex)
+            trame_hex = trame_hex.decode('ascii')
             
             # Utiliser le temps actuel comme timestamp si non disponible
             timestamp = int(time.time() * 1000)
             
             metadonnees = {
-                'power': rssi,  # Utiliser RSSI comme power
-                'lqi': '0',     # LQI non disponible, utiliser 0 comme valeur par défaut
-                'timestamp': str(timestamp),
+                'power': int(rssi),  # Utiliser RSSI comme power
+                'lqi': 0,            # LQI non disponible, utiliser 0 comme valeur par défaut
+                'timestamp': timestamp,
                 'trame_brute': trame_hex,
                 'canal': self.canal,
-                'sequence': sequence,
-                'taille': taille
+                'sequence': int(sequence),
+                'taille': int(taille)
             }
             
             # Si PCAP est activé, ajouter la trame au fichier PCAP
@@ -517,11 +1440,11 @@ class SniffeurZigbee:
             decoded_frame = decoder.decoder_trame_zigbee(paquet_bytes)
             if decoded_frame:
                 decoded_frame['metadonnees'] = metadonnees
-                self.captures.append(decoded_frame)
+                self._enregistrer_trame(decoded_frame, paquet_bytes)
             else:
-                logger.warning(f"Impossible de décoder la trame ESP32H2 : {trame_hex}")
-        else:
-            logger.warning(f"Format de paquet ESP32H2 non reconnu: {paquet}")
+                logger.warning("Impossible de décoder la trame ESP32H2 : %s", trame_hex)
+        elif logger.isEnabledFor(logging.WARNING):
+            logger.warning("Format de paquet ESP32H2 non reconnu: %s", paquet.decode('utf-8', errors='replace'))
 
     def _initialiser_pcap(self):
         """
@@ -529,8 +1452,8 @@ class SniffeurZigbee:
     
     Cette méthode crée un fichier PCAP pour stocker les trames capturées lorsque
     le format de sortie est configuré sur 'pcap'. Elle s'assure que le fichier
-    a l'extension .pcap et configure le PcapWriter de Scapy avec les paramètres
-    appropriés pour les trames IEEE 802.15.4 (ZigBee).
+    a l'extension .pcap, l'ouvre en écriture binaire et y écrit l'en-tête global PCAP
+    pour les trames IEEE 802.15.4 (ZigBee).
     
     Effets de bord:
     - Modifie l'extension du fichier de sortie si nécessaire
@@ -538,11 +1461,14 @@ class SniffeurZigbee:
     
     Notes
     -----
+    - Le fichier est écrit directement avec `struct`, sans Scapy : `self.pcap_writer` est
+      un simple fichier binaire, dont les méthodes `flush` et `close` sont utilisées ailleurs
     - Utilise le linktype 195 qui correspond au format IEEE 802.15.4
     - En cas d'erreur lors de l'initialisation du fichier PCAP,
       le format de sortie est automatiquement basculé vers 'json'
-    - La synchronisation forcée (sync=True) garantit que les données sont écrites
-      immédiatement sur le disque, ce qui est utile en cas d'arrêt inattendu
+    - Les écritures sont mises en tampon : le tampon est vidé toutes les
+      TAILLE_LOT_PCAP trames et à l'arrêt du sniffer, au lieu d'un appel système par trame.
+      En cas d'arrêt inattendu, au plus TAILLE_LOT_PCAP trames peuvent être perdues
     """
         if self.format_sortie == 'pcap':
             try:
@@ -550,22 +1476,44 @@ class SniffeurZigbee:
                 if not self.fichier_sortie.endswith('.pcap'):
                     self.fichier_sortie = os.path.splitext(self.fichier_sortie)[0] + '.pcap'
                 
-                # Créer le PcapWriter avec les bons paramètres
                 # linktype=195 pour IEEE 802.15.4 (Zigbee utilise cette couche physique)
-                self.pcap_writer = scapy.PcapWriter(self.fichier_sortie, linktype=195, append=False, sync=True)
-                logger.info(f"Fichier PCAP initialisé: {self.fichier_sortie}")
+                self.pcap_writer = open(self.fichier_sortie, 'wb')
+                self.pcap_writer.write(ENTETE_GLOBAL_PCAP.pack(
+                    0xa1b2c3d4, 2, 4, 0, 0, 0xFFFF, LINKTYPE_IEEE802_15_4
+                ))
+                self._trames_pcap_non_videes = 0
+                logger.info("Fichier PCAP initialisé: %s", self.fichier_sortie)
             except Exception as e:
-                logger.error(f"Erreur lors de l'initialisation du fichier PCAP: {e}")
+                logger.error("Erreur lors de l'initialisation du fichier PCAP: %s", e)
                 self.format_sortie = 'json'
-                logger.info(f"Format de sortie basculé sur JSON en raison de l'erreur")
+                logger.info("Format de sortie basculé sur JSON en raison de l'erreur")
+
+    def _ouvrir_fichier_jsonl(self):
+        """
+        Ouvre le fichier .jsonl dans lequel les trames sont écrites pendant la capture.
+
+        Le fichier porte le nom du fichier de sortie avec l'extension .jsonl, au format
+        JSON Lines (une trame JSON par ligne) : les trames y sont ajoutées au fil de l'eau
+        par `_publier`, y compris celles sorties de `captures` une fois `max_captures`
+        atteint. Il est ouvert en ajout : un redémarrage du sniffer (changement de canal,
+        rejeu) ne perd aucune trame déjà écrite. Le fichier de sortie lui-même reste écrit
+        par `sauvegarder_captures`.
+        """
+        fichier_jsonl = os.path.splitext(self.fichier_sortie)[0] + '.jsonl'
+        try:
+            self._fichier_jsonl = open(fichier_jsonl, 'ab')
+        except OSError as e:
+            logger.error("Erreur lors de l'ouverture du fichier JSON Lines: %s", e)
+            self._fichier_jsonl = None
 
     def _ajouter_trame_pcap(self, trame_bytes, metadonnees):
         """
     Ajoute une trame au fichier PCAP.
     
-    Cette méthode convertit les données brutes d'une trame en un paquet Scapy
-    Dot15d4FCS, y associe les métadonnées pertinentes (LQI, RSSI, timestamp),
-    puis l'écrit dans le fichier PCAP.
+    Cette méthode écrit directement les octets de la trame dans le fichier PCAP,
+    avec le FCS recalculé et l'horodatage issu des métadonnées : un en-tête
+    d'enregistrement empaqueté par `struct` suivi de la trame, en une seule écriture
+    dans le tampon du fichier.
     
     Paramètres
     ----------
@@ -573,35 +1521,59 @@ class SniffeurZigbee:
         Les données brutes de la trame en format binaire.
     metadonnees : dict
         Dictionnaire contenant les métadonnées associées à la trame.
-        Doit contenir au minimum les clés 'lqi', 'power' et 'timestamp'.
+        Doit contenir au minimum la clé 'timestamp' (entier, en millisecondes).
     
     Notes
     -----
-    - La méthode initialise un objet Dot15d4FCS de Scapy avec les données brutes
-    - Le FCS (Frame Check Sequence) est effacé pour que Scapy le recalcule automatiquement
-    - Les valeurs LQI, RSSI et timestamp sont extraites des métadonnées et
-      associées au paquet Scapy
-    - Le timestamp est converti de millisecondes à secondes (format PCAP)
+    - Aucun paquet Scapy n'est construit : la dissection puis la reconstruction d'un
+      Dot15d4FCS coûtaient bien plus cher que l'écriture elle-même
+    - Le FCS (Frame Check Sequence) est recalculé avec `calculer_fcs`, comme le faisait
+      Scapy, l'adaptateur ne transmettant pas toujours un FCS valide
+    - Le format PCAP (linktype 195) ne transporte ni LQI ni RSSI, qui restent
+      disponibles dans les captures JSON et pickle
+    - Le timestamp est converti de millisecondes en secondes et microsecondes (format PCAP)
     - Les erreurs lors de l'ajout sont capturées et journalisées sans interrompre
       le processus de capture
     """
         try:
-            # Créer un paquet Scapy à partir des données
-            dot15d4_pkt = Dot15d4FCS(trame_bytes) 
-            dot15d4_pkt.fcs = None  # Forcer Scapy à recalculer le FCS
-            
-            
-            dot15d4_pkt.lqi = int(metadonnees['lqi'])
-            dot15d4_pkt.rssi = int(metadonnees['power'])
-            
-            
-            timestamp = float(metadonnees['timestamp']) / 1000.0
-            dot15d4_pkt.time = timestamp
+            # Remplacer le FCS reçu par celui recalculé sur le reste de la trame
+            corps = trame_bytes[:-2]
+            secondes, millisecondes = divmod(metadonnees['timestamp'], 1000)
+            longueur = len(corps) + 2
 
-            self.pcap_writer.write(dot15d4_pkt)
+            self.pcap_writer.write(
+                ENTETE_ENREGISTREMENT_PCAP.pack(secondes, millisecondes * 1000, longueur, longueur)
+                + corps + calculer_fcs(corps)
+            )
+
+            self._trames_pcap_non_videes += 1
+            if self._trames_pcap_non_videes >= TAILLE_LOT_PCAP:
+                self.pcap_writer.flush()
+                self._trames_pcap_non_videes = 0
             
         except Exception as e:
-            logger.error(f"Erreur lors de l'ajout de la trame au fichier PCAP: {e}")
+            logger.error("Erreur lors de l'ajout de la trame au fichier PCAP: %s", e)
+
+    def _attendre_fin_threads(self):
+        """
+        Attend, au plus DELAI_ARRET_THREADS secondes chacun, la fin des threads de capture
+        et de traitement d'une capture précédente.
+
+        Retours
+        -------
+        bool
+            True si aucun de ces threads n'est encore actif. Sinon, un avertissement est
+            journalisé pour chaque thread qui ne s'est pas terminé à temps.
+        """
+        termines = True
+        for nom, thread in (("capture", self._thread_capture), ("traitement", self._thread_traitement)):
+            if thread is None or thread is threading.current_thread():
+                continue
+            thread.join(timeout=DELAI_ARRET_THREADS)
+            if thread.is_alive():
+                logger.warning("Le thread de %s ne s'est pas terminé après %.1f s", nom, DELAI_ARRET_THREADS)
+                termines = False
+        return termines
 
     def demarrer_sniffer(self):
         """
@@ -611,10 +1583,18 @@ class SniffeurZigbee:
             - Un thread pour la capture des paquets (_capturer_paquets).
             - Un thread pour le traitement et le décodage des paquets (_traiter_paquets).
 
-        Si le format de sortie est PCAP, initialise également le fichier PCAP.
+        Si le format de sortie est PCAP, initialise également le fichier PCAP ; si `flux_jsonl`
+        est activé, ouvre le fichier .jsonl dans lequel les trames sont écrites au fil de la capture.
+
+        Les threads d'une capture précédente doivent être terminés : s'ils sont encore actifs
+        (voir `_attendre_fin_threads`), le sniffer n'est pas démarré, afin qu'ils ne partagent
+        ni la file des paquets ni le port série avec les nouveaux threads.
 
         En cas d'erreur lors du démarrage, un message d'erreur est logué.
         """
+        if not self._attendre_fin_threads():
+            logger.error("Sniffer non démarré : la capture précédente est toujours en cours d'arrêt")
+            return
         try:
             self.est_en_cours = True
             self._configurer_sniffer()
@@ -622,40 +1602,67 @@ class SniffeurZigbee:
             # Initialiser le fichier PCAP si nécessaire
             if self.format_sortie == 'pcap':
                 self._initialiser_pcap()
-            
+            if self.flux_jsonl:
+                self._ouvrir_fichier_jsonl()
                 
-            threading.Thread(target=self._capturer_paquets, daemon=True).start()
-            threading.Thread(target=self._traiter_paquets, daemon=True).start()
+            # Les threads précédents sont terminés : la file ne contient plus que des restes
+            self._vider_file_paquets()
+            self._thread_capture = threading.Thread(target=self._capturer_paquets, daemon=True)
+            self._thread_capture.start()
+            self._thread_traitement = threading.Thread(target=self._traiter_paquets, daemon=True)
+            self._thread_traitement.start()
             
-            logger.info(f"Sniffer démarré sur le canal {self.canal} (format de sortie: {self.format_sortie})")
+            logger.info("Sniffer démarré sur le canal %s (format de sortie: %s)", self.canal, self.format_sortie)
         except Exception as e:
-            logger.error(f"Erreur lors du démarrage du sniffer : {e}")
+            logger.error("Erreur lors du démarrage du sniffer : %s", e)
             self.est_en_cours = False
 
     def arreter_sniffer(self):
         """
         Arrête le sniffer.
 
-        Cette méthode modifie le drapeau d'exécution afin d'arrêter les threads de capture 
-        et de traitement. Un message d'information est logué pour indiquer l'arrêt.
+        Cette méthode modifie le drapeau d'exécution afin d'arrêter le thread de capture,
+        et dépose le marqueur FIN_TRAITEMENT dans la file pour terminer le thread de traitement. Un message d'information est logué pour indiquer l'arrêt.
         
-        Si le format de sortie est PCAP, ferme également le fichier PCAP.
+        Attend ensuite la fin des threads de capture et de traitement (voir
+        `_attendre_fin_threads`, qui journalise un thread encore actif), puis ferme le
+        fichier PCAP ou .jsonl éventuellement ouvert, ce qui écrit les trames encore en tampon.
         """
         self.est_en_cours = False
+        # Réveil et fin du thread de traitement, une fois les paquets déjà reçus traités
+        if self._thread_traitement is not None and self._thread_traitement.is_alive():
+            self.file_paquets.put(FIN_TRAITEMENT)
         
-        # Fermer le fichier PCAP si nécessaire
-        if self.format_sortie == 'pcap' and self.pcap_writer:
+        self._attendre_fin_threads()
+
+        # Fermer le fichier de sortie si nécessaire, après l'écriture des dernières trames ;
+        # la fermeture vide le tampon d'écriture
+        if self.pcap_writer:
             self.pcap_writer.close()
             self.pcap_writer = None
+        if self._fichier_jsonl is not None:
+            self._fichier_jsonl.close()
+            self._fichier_jsonl = None
             
         logger.info("Arrêt du sniffer")
 
     def sauvegarder_captures(self):
         """
-        Sauvegarde les trames capturées dans un fichier JSON ou PCAP.
+        Sauvegarde les trames capturées dans un fichier JSON, pickle ou PCAP.
 
         Selon le format de sortie sélectionné, cette méthode sauvegarde les captures
-        soit au format JSON soit au format PCAP.
+        au format JSON, au format pickle (binaire, plus rapide à recharger) ou au format PCAP.
+        Le JSON est un tableau compact, écrit par orjson lorsqu'il est installé et sinon par
+        le module json de la bibliothèque standard. Un fichier .jsonl écrit au fil de la
+        capture (voir `_ouvrir_fichier_jsonl`) est seulement fermé.
+
+        Notes
+        -----
+        Les formats JSON et pickle sérialisent en une fois le contenu de `captures`, c'est-à-dire
+        au plus les `max_captures` dernières trames : les plus anciennes en sont évincées sans
+        être écrites. Pour conserver toutes les trames d'une longue capture, activer
+        `flux_jsonl` (option --jsonl) : le fichier .jsonl reçoit chaque trame au fil de l'eau
+        et n'est jamais tronqué.
 
         Lève
         ----
@@ -668,9 +1675,24 @@ class SniffeurZigbee:
                 if not self.fichier_sortie.endswith('.json'):
                     self.fichier_sortie = os.path.splitext(self.fichier_sortie)[0] + '.json'
                 
-                with open(self.fichier_sortie, 'w', encoding='utf-8') as f:
-                    json.dump(self.captures, f, indent=2, ensure_ascii=False)
-                logger.info(f"Captures sauvegardées au format JSON dans {self.fichier_sortie}")
+                if self._fichier_jsonl is not None:
+                    self._fichier_jsonl.close()
+                    self._fichier_jsonl = None
+                # JSON compact écrit directement en UTF-8 (orjson si installé)
+                with open(self.fichier_sortie, 'wb') as f:
+                    f.write(_json_dumps([self._trame_a_sauvegarder(trame) for trame in self.captures]))
+                logger.info("Captures sauvegardées au format JSON dans %s", self.fichier_sortie)
+            
+            elif self.format_sortie == 'pickle':
+                # Les trames décodées sont conservées telles quelles : le rechargement
+                # ne repasse ni par l'analyse JSON ni par le décodeur
+                if not self.fichier_sortie.endswith('.pickle'):
+                    self.fichier_sortie = os.path.splitext(self.fichier_sortie)[0] + '.pickle'
+                
+                with open(self.fichier_sortie, 'wb') as f:
+                    pickle.dump([self._trame_a_sauvegarder(trame) for trame in self.captures], f,
+                                protocol=pickle.HIGHEST_PROTOCOL)
+                logger.info("Captures sauvegardées au format pickle dans %s", self.fichier_sortie)
             
             elif self.format_sortie == 'pcap':
                 # Le fichier PCAP est écrit en continu pendant la capture
@@ -678,13 +1700,13 @@ class SniffeurZigbee:
                 if self.pcap_writer:
                     self.pcap_writer.close()
                     self.pcap_writer = None
-                logger.info(f"Captures sauvegardées au format PCAP dans {self.fichier_sortie}")
+                logger.info("Captures sauvegardées au format PCAP dans %s", self.fichier_sortie)
             
             else:
-                logger.warning(f"Format de sortie non reconnu: {self.format_sortie}")
+                logger.warning("Format de sortie non reconnu: %s", self.format_sortie)
         
         except Exception as e:
-            logger.error(f"Erreur lors de la sauvegarde des captures : {e}")
+            logger.error("Erreur lors de la sauvegarde des captures : %s", e)
 
     def definir_format_sortie(self, format_sortie):
         """
@@ -700,6 +1722,8 @@ class SniffeurZigbee:
         Format de sortie à utiliser. Valeurs acceptées:
         - 'json': sauvegarde les données sous forme de structure JSON
         - 'pcap': sauvegarde les trames dans un fichier PCAP lisible par Wireshark
+        - 'pickle': sauvegarde binaire des trames décodées, rechargeable sans réanalyse
+          (à ne relire que depuis une source de confiance)
     
     Effets de bord:
     - Modifie l'attribut self.format_sortie
@@ -710,7 +1734,7 @@ class SniffeurZigbee:
     - Si un format non supporté est fourni, la méthode utilise 'json' par défaut
       et enregistre un avertissement dans les logs
     - L'extension du fichier de sortie est automatiquement mise à jour pour
-      refléter le format choisi (.json ou .pcap)
+      refléter le format choisi (.json, .pcap ou .pickle)
     - Un message d'information est journalisé pour confirmer la configuration
     
     Exemple
@@ -718,8 +1742,8 @@ class SniffeurZigbee:
     >>> sniffer = SniffeurZigbee(fichier_sortie='captures')
     >>> sniffer.definir_format_sortie('pcap')  # Fichier de sortie devient 'captures.pcap'
     """
-        if format_sortie.lower() not in ['json', 'pcap']:
-            logger.warning(f"Format de sortie non pris en charge: {format_sortie}. Utilisation de 'json'.")
+        if format_sortie.lower() not in ['json', 'pcap', 'pickle']:
+            logger.warning("Format de sortie non pris en charge: %s. Utilisation de 'json'.", format_sortie)
             self.format_sortie = 'json'
         else:
             self.format_sortie = format_sortie.lower()
@@ -728,5 +1752,43 @@ class SniffeurZigbee:
         nom_base, _ = os.path.splitext(self.fichier_sortie)
         self.fichier_sortie = nom_base + ('.' + self.format_sortie)
         
-        logger.info(f"Format de sortie défini sur {self.format_sortie}, fichier de sortie: {self.fichier_sortie}")
+        logger.info("Format de sortie défini sur %s, fichier de sortie: %s", self.format_sortie, self.fichier_sortie)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Capture de trames ZigBee depuis un adaptateur série.")
+    parser.add_argument('--canal', type=int, default=13, help="canal ZigBee (11-26)")
+    parser.add_argument('--interface', help="périphérique série (par défaut celui choisi par le sniffer)")
+    parser.add_argument('--materiel', choices=['nrf52', 'esp32h2'], default='nrf52', help="adaptateur utilisé")
+    parser.add_argument('--format', dest='format_sortie', choices=['json', 'pcap', 'pickle'], default='json',
+                        help="format du fichier de sortie")
+    parser.add_argument('--sortie', default='captures_zigbee.json', help="fichier de sortie")
+    parser.add_argument('--duree', type=float, default=10, help="durée de la capture en secondes")
+    parser.add_argument('--cle', default='', help="clé réseau (hexadécimal) pour déchiffrer les trames")
+    parser.add_argument('--jsonl', action='store_true',
+                        help="écrire aussi les trames au fil de la capture dans un fichier .jsonl")
+    parser.add_argument('--coeurs', type=int, nargs='+', metavar='COEUR',
+                        help="cœurs CPU des threads de capture et de traitement (un seul cœur : partagé)")
+    parser.add_argument('--temps-reel', dest='priorite', type=int, metavar='PRIORITE',
+                        help="priorité SCHED_FIFO (1-99) du thread de capture, requiert CAP_SYS_NICE")
+    args = parser.parse_args()
 
+    sniffer = SniffeurZigbee(canal=args.canal, fichier_sortie=args.sortie,
+                             format_sortie=args.format_sortie, materiel=args.materiel)
+    if args.interface:
+        sniffer.interface = args.interface
+    sniffer.cle_dechiffrement = args.cle
+    sniffer.flux_jsonl = args.jsonl
+    if args.coeurs and len(args.coeurs) > 2:
+        parser.error("--coeurs attend un ou deux numéros de cœur")
+    sniffer.definir_coeurs_threads(args.coeurs)
+    sniffer.priorite_capture = args.priorite
+    sniffer.demarrer_sniffer()
+    try:
+        time.sleep(args.duree)
+    except KeyboardInterrupt:
+        pass
+    sniffer.arreter_sniffer()
+    sniffer.sauvegarder_captures()
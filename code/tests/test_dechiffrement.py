@@ -0,0 +1,81 @@
+"""
+Vérifie les deux chemins CCM* logiciels de sniff.py (trame seule et lot) contre
+l'implémentation AESCCM du paquet cryptography.
+"""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+aead = pytest.importorskip('cryptography.hazmat.primitives.ciphers.aead')
+
+import sniff  # noqa: E402
+
+
+def _cas_aleatoires(nombre, graine=1):
+    """
+    Génère des cas (clé, nonce, données authentifiées, clair, chiffré et MIC) chiffrés par AESCCM.
+    """
+    alea = random.Random(graine)
+    cas = []
+    for _ in range(nombre):
+        cle = alea.randbytes(16)
+        nonce = alea.randbytes(13)
+        donnees_authentifiees = alea.randbytes(alea.randint(0, 40))
+        clair = alea.randbytes(alea.randint(0, 100))
+        chiffre_et_mic = aead.AESCCM(cle, tag_length=sniff.LONGUEUR_MIC).encrypt(
+            nonce, clair, donnees_authentifiees
+        )
+        cas.append((cle, nonce, donnees_authentifiees, clair, chiffre_et_mic))
+    return cas
+
+
+def test_trame_seule_identique_a_aesccm():
+    for cle, nonce, donnees_authentifiees, clair, chiffre_et_mic in _cas_aleatoires(500):
+        resultat = sniff._dechiffrer_ccm_logiciel(
+            sniff.contexte_aes(cle.hex()), nonce, donnees_authentifiees, chiffre_et_mic
+        )
+        assert resultat == {'succes': True, 'payload': clair.hex()}
+
+
+def test_lot_identique_a_aesccm():
+    cle = bytes(range(16))
+    aes = sniff.contexte_aes(cle.hex())
+    ccm = aead.AESCCM(cle, tag_length=sniff.LONGUEUR_MIC)
+    alea = random.Random(2)
+    elements, clairs = [], []
+    for _ in range(300):
+        nonce = alea.randbytes(13)
+        donnees_authentifiees = alea.randbytes(alea.randint(0, 40))
+        clair = alea.randbytes(alea.randint(0, 100))
+        elements.append((nonce, donnees_authentifiees, ccm.encrypt(nonce, clair, donnees_authentifiees)))
+        clairs.append(clair)
+    resultats = sniff._dechiffrer_lot_logiciel(aes, elements)
+    assert resultats == [{'succes': True, 'payload': clair.hex()} for clair in clairs]
+
+
+@pytest.mark.parametrize('position', [0, -1, -sniff.LONGUEUR_MIC - 1])
+def test_mic_invalide_rejete(position):
+    cle = bytes(range(16))
+    aes = sniff.contexte_aes(cle.hex())
+    ccm = aead.AESCCM(cle, tag_length=sniff.LONGUEUR_MIC)
+    nonce = bytes(13)
+    donnees_authentifiees = b'\x48\x02\x00\x00'
+    chiffre_et_mic = ccm.encrypt(nonce, b'\x40\x0a\x06\x00\x04\x01\x01\x52\x01\x02', donnees_authentifiees)
+    altere = bytearray(chiffre_et_mic)
+    altere[position] ^= 0x01
+    altere = bytes(altere)
+
+    attendu = {'succes': False, 'erreur': "MIC invalide"}
+    assert sniff._dechiffrer_ccm_logiciel(aes, nonce, donnees_authentifiees, altere) == attendu
+    # Dans un lot, seule la trame altérée est rejetée
+    resultats = sniff._dechiffrer_lot_logiciel(aes, [
+        (nonce, donnees_authentifiees, chiffre_et_mic),
+        (nonce, donnees_authentifiees, altere),
+    ])
+    assert resultats[0]['succes'] is True
+    assert resultats[1] == attendu